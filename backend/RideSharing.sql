@@ -547,15 +547,19 @@ CREATE TABLE dispatch_attempt (
     updated_on TIMESTAMPTZ
 );
 
-CREATE TABLE trip_route_point (
-    id BIGSERIAL PRIMARY KEY,
+-- Delta-encoded route points, one row per chunk (see app/utils/route_codec.py)
+CREATE TABLE trip_route_chunk (
+    chunk_id BIGSERIAL PRIMARY KEY,
     trip_id BIGINT NOT NULL REFERENCES trip(trip_id) ON DELETE CASCADE,
 
-    latitude DECIMAL(9,6) NOT NULL,
-    longitude DECIMAL(9,6) NOT NULL,
-    recorded_at TIMESTAMPTZ NOT NULL
+    point_count INT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL,
+    ended_at TIMESTAMPTZ NOT NULL,
+    points BYTEA NOT NULL
 );
 
+CREATE INDEX idx_trip_route_chunk_trip ON trip_route_chunk(trip_id);
+
 CREATE TABLE dispatcher_assignment (
     assignment_id BIGSERIAL PRIMARY KEY,
 
@@ -1155,4 +1159,305 @@ INSERT INTO fare_config (tenant_id, city_id, vehicle_category, base_fare, per_km
 VALUES (1, 1, 'AUTO', 30, 10, 2, 50)
 ON CONFLICT (tenant_id, city_id, vehicle_category) DO NOTHING;
 
-update app_user set status = 'ACTIVE' where user_id in(7,8);
\ No newline at end of file
+update app_user set status = 'ACTIVE' where user_id in(7,8);
+
+-- Trips that went through every dispatch wave without an accept
+INSERT INTO lu_trip_status VALUES ('NO_DRIVER')
+ON CONFLICT (status_code) DO NOTHING;
+
+-- Wave currently out; workers compare-and-set it when an offer expires
+ALTER TABLE trip ADD COLUMN IF NOT EXISTS dispatch_wave INT NOT NULL DEFAULT 1;
+
+--------------------------------------------------
+-- driver_location_history: range partitions on recorded_at
+--------------------------------------------------
+-- The application creates upcoming partitions, drops expired ones and
+-- compacts old ones (see location_history_maintenance). This converts an
+-- existing unpartitioned table, with one daily partition per day of data.
+
+ALTER TABLE driver_location_history RENAME TO driver_location_history_legacy;
+
+CREATE TABLE driver_location_history (
+    id BIGSERIAL NOT NULL,
+    driver_id BIGINT NOT NULL REFERENCES app_user(user_id) ON DELETE CASCADE,
+    latitude DECIMAL(9,6) NOT NULL,
+    longitude DECIMAL(9,6) NOT NULL,
+    recorded_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE TABLE driver_location_history_default
+    PARTITION OF driver_location_history DEFAULT;
+
+CREATE TABLE driver_location_history_partition (
+    partition_name TEXT PRIMARY KEY,
+    range_start TIMESTAMPTZ NOT NULL,
+    range_end TIMESTAMPTZ NOT NULL,
+    compacted_at TIMESTAMPTZ
+);
+
+DO $$
+DECLARE
+    d DATE;
+    p TEXT;
+BEGIN
+    FOR d IN
+        SELECT generate_series(
+            min(recorded_at AT TIME ZONE 'UTC')::date,
+            (now() AT TIME ZONE 'UTC')::date,
+            INTERVAL '1 day'
+        )::date
+        FROM driver_location_history_legacy
+    LOOP
+        p := 'driver_location_history_p' || to_char(d, 'YYYYMMDD');
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF driver_location_history FOR VALUES FROM (%L) TO (%L)',
+            p, d::timestamp AT TIME ZONE 'UTC', (d + 1)::timestamp AT TIME ZONE 'UTC'
+        );
+        INSERT INTO driver_location_history_partition (partition_name, range_start, range_end)
+        VALUES (p, d::timestamp AT TIME ZONE 'UTC', (d + 1)::timestamp AT TIME ZONE 'UTC');
+    END LOOP;
+END $$;
+
+INSERT INTO driver_location_history (id, driver_id, latitude, longitude, recorded_at)
+SELECT id, driver_id, latitude, longitude, recorded_at
+FROM driver_location_history_legacy;
+
+SELECT setval(
+    pg_get_serial_sequence('driver_location_history', 'id'),
+    COALESCE((SELECT max(id) FROM driver_location_history), 0) + 1,
+    false
+);
+
+DROP TABLE driver_location_history_legacy;
+
+--------------------------------------------------
+-- Trip routes: trip_route_point (never written) -> trip_route_chunk
+--------------------------------------------------
+DROP TABLE IF EXISTS trip_route_point;
+
+CREATE TABLE IF NOT EXISTS trip_route_chunk (
+    chunk_id BIGSERIAL PRIMARY KEY,
+    trip_id BIGINT NOT NULL REFERENCES trip(trip_id) ON DELETE CASCADE,
+
+    point_count INT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL,
+    ended_at TIMESTAMPTZ NOT NULL,
+    points BYTEA NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_trip_route_chunk_trip ON trip_route_chunk(trip_id);
+
+-- Per-driver history lookups (location replay); created on every partition
+CREATE INDEX IF NOT EXISTS idx_driver_location_history_driver_time
+    ON driver_location_history (driver_id, recorded_at);
+
+--------------------------------------------------
+-- Zone attribution of ride requests (trip.zone_id already exists)
+--------------------------------------------------
+-- zone.boundary holds WKT (POLYGON/MULTIPOLYGON) or GeoJSON, lng/lat order
+ALTER TABLE ride_request ADD COLUMN IF NOT EXISTS zone_id BIGINT REFERENCES zone(zone_id);
+
+-- Surge demand: open requests per zone, counted in the database every tick
+CREATE INDEX IF NOT EXISTS idx_ride_request_open_zone
+    ON ride_request (zone_id, created_on) WHERE status = 'REQUESTED';
+
+--------------------------------------------------
+-- Fare finalization on trip completion
+--------------------------------------------------
+-- Category the rider confirmed; trip_fare_breakdown is priced from it
+ALTER TABLE trip ADD COLUMN IF NOT EXISTS vehicle_category TEXT REFERENCES lu_vehicle_category(category_code);
+-- Surge at confirmation; NULL for older trips, which are priced at the live surge
+ALTER TABLE trip ADD COLUMN IF NOT EXISTS surge_multiplier NUMERIC(4,2);
+CREATE INDEX IF NOT EXISTS idx_trip_fare_breakdown_trip ON trip_fare_breakdown(trip_id);
+
+--------------------------------------------------
+-- Striped platform wallet
+--------------------------------------------------
+-- platform_wallet now holds one row per stripe (id 1..PLATFORM_WALLET_STRIPES,
+-- created on first use); the platform balance is SUM(balance).
+-- Wallet balances are only changed by atomic in-database increments.
+
+--------------------------------------------------
+-- Batch settlement
+--------------------------------------------------
+-- Unsettled payments = SUCCESS payments with no settled_at. The settling
+-- transaction sets settled_at, so a payment is claimed exactly once.
+-- Payments settlement gave up on carry settlement_error; clear it once the
+-- row is fixed and the next batch picks the payment up again.
+CREATE INDEX IF NOT EXISTS idx_platform_ledger_trip ON platform_ledger(trip_id, entry_type);
+
+ALTER TABLE payment ADD COLUMN IF NOT EXISTS settled_at TIMESTAMPTZ;
+ALTER TABLE payment ADD COLUMN IF NOT EXISTS settlement_error TEXT;
+
+-- Payments settled before settled_at existed have their COMMISSION entry
+UPDATE payment p SET settled_at = now()
+WHERE p.status = 'SUCCESS'
+  AND p.settled_at IS NULL
+  AND EXISTS (
+      SELECT 1 FROM platform_ledger l
+      WHERE l.trip_id = p.trip_id AND l.entry_type = 'COMMISSION'
+  );
+
+DROP INDEX IF EXISTS idx_payment_success;
+CREATE INDEX IF NOT EXISTS idx_payment_unsettled ON payment(payment_id)
+    WHERE status = 'SUCCESS' AND settled_at IS NULL AND settlement_error IS NULL;
+
+--------------------------------------------------
+-- Idempotent payment requests
+--------------------------------------------------
+-- First response per (user, Idempotency-Key), written in the payment's own
+-- transaction; rows older than IDEMPOTENCY_KEY_TTL_HOURS are purged.
+CREATE TABLE IF NOT EXISTS idempotency_key (
+    user_id BIGINT NOT NULL REFERENCES app_user(user_id),
+    idempotency_key VARCHAR(255) NOT NULL,
+
+    request_hash CHAR(64) NOT NULL,
+    status_code INT,
+    response JSONB,
+
+    created_on TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_key_created ON idempotency_key(created_on);
+
+--------------------------------------------------
+-- Ledger balance snapshots
+--------------------------------------------------
+-- Sum of an owner's ledger entries written by transactions before
+-- as_of_xid; balances add the entries of later transactions.
+-- ledger: PLATFORM (owner 0), TENANT, FLEET. Needs PostgreSQL 13+.
+CREATE TABLE IF NOT EXISTS ledger_balance_snapshot (
+    ledger TEXT NOT NULL,
+    owner_id BIGINT NOT NULL,
+
+    as_of_xid BIGINT NOT NULL,
+    balance NUMERIC(14,2) NOT NULL,
+    entry_count BIGINT NOT NULL,
+
+    updated_on TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (ledger, owner_id)
+);
+
+-- Snapshots keyed by entry id cannot be converted; the next rollup rebuilds them
+ALTER TABLE ledger_balance_snapshot ADD COLUMN IF NOT EXISTS as_of_xid BIGINT;
+DELETE FROM ledger_balance_snapshot WHERE as_of_xid IS NULL;
+ALTER TABLE ledger_balance_snapshot DROP COLUMN IF EXISTS as_of_entry_id;
+ALTER TABLE ledger_balance_snapshot ALTER COLUMN as_of_xid SET NOT NULL;
+
+-- Transaction that wrote each entry; existing entries get this migration's
+ALTER TABLE platform_ledger ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL
+    DEFAULT (pg_current_xact_id()::text::bigint);
+ALTER TABLE tenant_ledger ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL
+    DEFAULT (pg_current_xact_id()::text::bigint);
+ALTER TABLE fleet_ledger ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL
+    DEFAULT (pg_current_xact_id()::text::bigint);
+
+CREATE INDEX IF NOT EXISTS idx_tenant_ledger_tenant_entry ON tenant_ledger(tenant_id, entry_id);
+CREATE INDEX IF NOT EXISTS idx_fleet_ledger_fleet_entry ON fleet_ledger(fleet_id, entry_id);
+CREATE INDEX IF NOT EXISTS idx_platform_ledger_txid ON platform_ledger(txid);
+CREATE INDEX IF NOT EXISTS idx_tenant_ledger_txid ON tenant_ledger(txid);
+CREATE INDEX IF NOT EXISTS idx_tenant_ledger_tenant_txid ON tenant_ledger(tenant_id, txid);
+CREATE INDEX IF NOT EXISTS idx_fleet_ledger_txid ON fleet_ledger(txid);
+CREATE INDEX IF NOT EXISTS idx_fleet_ledger_fleet_txid ON fleet_ledger(fleet_id, txid);
+
+--------------------------------------------------
+-- Tenant payouts
+--------------------------------------------------
+-- Payouts are booked in tenant_ledger as PAYOUT (negative) and, when the
+-- backend rejects them, PAYOUT_REVERSAL entries.
+ALTER TABLE tenant_settlement ADD COLUMN IF NOT EXISTS payout_reference TEXT;
+CREATE INDEX IF NOT EXISTS idx_tenant_settlement_pending
+    ON tenant_settlement(tenant_id) WHERE status = 'PENDING';
+
+--------------------------------------------------
+-- Session cache invalidation
+--------------------------------------------------
+-- Workers cache validated sessions and LISTEN on auth_invalidation; any
+-- change to a user or session, from the app or by hand, evicts it.
+CREATE OR REPLACE FUNCTION notify_auth_invalidation() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'app_user' THEN
+        PERFORM pg_notify('auth_invalidation', 'user:' || OLD.user_id);
+    ELSE
+        PERFORM pg_notify('auth_invalidation', 'session:' || OLD.session_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_app_user_auth_invalidation ON app_user;
+CREATE TRIGGER trg_app_user_auth_invalidation
+    AFTER UPDATE OR DELETE ON app_user
+    FOR EACH ROW EXECUTE FUNCTION notify_auth_invalidation();
+
+DROP TRIGGER IF EXISTS trg_user_session_auth_invalidation ON user_session;
+CREATE TRIGGER trg_user_session_auth_invalidation
+    AFTER UPDATE OR DELETE ON user_session
+    FOR EACH ROW EXECUTE FUNCTION notify_auth_invalidation();
+
+--------------------------------------------------
+-- Snapshot versions
+--------------------------------------------------
+-- In-process snapshots (fares, fare rules, zones) poll one row per table
+-- instead of scanning it; any write, from the app or by hand, bumps it.
+CREATE TABLE IF NOT EXISTS table_version (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO table_version (table_name, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = table_version.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'fare_config', 'tenant', 'pricing_time_rule', 'tenant_tax_rule', 'city', 'zone'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', 'trg_' || t || '_table_version', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()',
+            'trg_' || t || '_table_version', t
+        );
+    END LOOP;
+END $$;
+
+--------------------------------------------------
+-- Driver index invalidation
+--------------------------------------------------
+-- Workers keep an in-memory index of dispatchable drivers and LISTEN on
+-- driver_index_removal; ending a shift or losing approval, from the app or
+-- by hand, drops the driver from every worker's index.
+CREATE OR REPLACE FUNCTION notify_driver_index_removal() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('driver_index_removal', OLD.driver_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_driver_shift_index_removal ON driver_shift;
+CREATE TRIGGER trg_driver_shift_index_removal
+    AFTER UPDATE ON driver_shift
+    FOR EACH ROW
+    WHEN (OLD.ended_at IS NULL AND NEW.ended_at IS NOT NULL)
+    EXECUTE FUNCTION notify_driver_index_removal();
+
+DROP TRIGGER IF EXISTS trg_driver_profile_index_removal ON driver_profile;
+CREATE TRIGGER trg_driver_profile_index_removal
+    AFTER UPDATE ON driver_profile
+    FOR EACH ROW
+    WHEN (OLD.approval_status = 'APPROVED' AND NEW.approval_status <> 'APPROVED')
+    EXECUTE FUNCTION notify_driver_index_removal();
+
+-- Index refreshes read positions and heartbeats stored since the last one
+CREATE INDEX IF NOT EXISTS idx_driver_location_last_updated
+    ON driver_location(last_updated);
@@ -2,8 +2,10 @@ from fastapi import Header, HTTPException, Depends
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone,timedelta
 
+from app.core.config import SESSION_LIFETIME_DAYS
 from app.core.database import SessionLocal
 from app.models import UserSession, AppUser
+from app.services.session_cache import session_cache
 
 
 def get_db():
@@ -14,12 +16,20 @@ def get_db():
         db.close()
 
 
-def get_current_user(
-    x_session_id: str = Header(...),
-    db: Session = Depends(get_db)
-):
+def get_session_user(db: Session, session_id: str):
+    now = datetime.now(timezone.utc)
+
+    # Validated recently: attach the cached user without a query
+    cached = session_cache.get(session_id)
+    if cached and cached.expires_at > now:
+        return db.merge(cached.user, load=False)
+
+    # Taken before reading: an invalidation meanwhile keeps this result
+    # out of the cache
+    generation = session_cache.generation(session_id)
+
     session = db.query(UserSession).filter(
-        UserSession.session_id == x_session_id
+        UserSession.session_id == session_id
     ).first()
 
     if not session:
@@ -28,7 +38,8 @@ def get_current_user(
     if session.logout_at:
         raise HTTPException(status_code=401, detail="Session logged out")
 
-    if session.login_at + timedelta(days=7) < datetime.now(timezone.utc):
+    expires_at = session.login_at + timedelta(days=SESSION_LIFETIME_DAYS)
+    if expires_at < now:
         raise HTTPException(status_code=401, detail="Session expired")
 
     user = db.query(AppUser).filter(
@@ -38,4 +49,12 @@ def get_current_user(
     if not user or user.status != "ACTIVE":
         raise HTTPException(status_code=401, detail="User inactive")
 
+    session_cache.set(session_id, user, expires_at, now, generation)
     return user
+
+
+def get_current_user(
+    x_session_id: str = Header(...),
+    db: Session = Depends(get_db)
+):
+    return get_session_user(db, x_session_id)
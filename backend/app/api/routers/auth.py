@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from datetime import datetime,timezone
 
 from app.core.database import SessionLocal
 from app.models import AppUser, UserAuth, UserSession
 from app.schemas.auth import LoginRequest, LoginResponse, UserInfo
+from app.services.session_cache import session_cache
 from app.utils.security import verify_password, generate_session_id
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -52,3 +53,19 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
             status=user.status
         )
     )
+
+
+@router.post("/logout")
+def logout(x_session_id: str = Header(...), db: Session = Depends(get_db)):
+    session = db.query(UserSession).filter(
+        UserSession.session_id == x_session_id,
+        UserSession.logout_at.is_(None)
+    ).first()
+
+    if session:
+        session.logout_at = datetime.now(timezone.utc)
+        db.commit()
+
+    # Other workers hear about it through the user_session trigger
+    session_cache.invalidate_session(x_session_id)
+    return {"message": "Logged out"}
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
-from app.api.deps.auth import get_current_user
+from app.api.deps.auth import get_current_user, get_session_user
 from app.schemas.trip import RiderRequestTrip, TripResponse
 from app.services.driver_trip_service import DriverTripService
+from app.services.offer_push_service import offer_hub
 from app.models.identity import AppUser
 
 router = APIRouter(prefix="/drivers", tags=["DriverTrips"])
@@ -26,6 +29,46 @@ def get_trip_offers(
         driver_id=current_user.user_id
     )
 
+@router.websocket("/trips/offers/ws")
+async def trip_offers_ws(
+    websocket: WebSocket,
+    session_id: str = Query(...)
+):
+    # Browsers can't set X-Session-ID on a WebSocket, so it comes as a query param
+    def authenticate():
+        db = SessionLocal()
+        try:
+            return get_session_user(db, session_id).user_id
+        finally:
+            db.close()
+
+    try:
+        driver_id = await run_in_threadpool(authenticate)
+    except HTTPException as exc:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason=str(exc.detail)
+        )
+        return
+
+    def load_offers():
+        db = SessionLocal()
+        try:
+            return jsonable_encoder(
+                DriverTripService.get_trip_offers(db=db, driver_id=driver_id)
+            )
+        finally:
+            db.close()
+
+    await websocket.accept()
+    # The hub registers the connection before loading, so nothing published
+    # while the snapshot is read is missed
+    await offer_hub.serve(
+        websocket,
+        driver_id,
+        lambda: run_in_threadpool(load_offers)
+    )
+
 @router.post("/trips/{trip_id}/accept")
 def accept_trip(
     trip_id: int,
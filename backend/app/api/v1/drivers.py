@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Body, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
@@ -8,8 +10,9 @@ from app.services.driver_service import DriverService
 from app.services.tenant_service import TenantService
 from app.models.identity import AppUser
 from app.services.driver_shift_service import DriverShiftService
-from app.schemas.driver_location import DriverLocationUpdateRequest
+from app.schemas.driver_location import DriverLocationUpdateRequest, DriverLocationBatchRequest
 from app.services.driver_location_service import DriverLocationService
+from app.services.location_replay_service import LocationReplayService
 
 
 
@@ -90,3 +93,49 @@ def update_driver_location(
     )
     return {"message": "Location updated successfully"}
 
+@router.post("/location/batch")
+def update_driver_locations(
+    data: DriverLocationBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    count = DriverLocationService.update_locations(
+        db=db,
+        user=current_user,
+        fixes=data.fixes
+    )
+    return {"message": "Locations recorded successfully", "count": count}
+
+
+@router.post("/location/binary")
+def update_driver_locations_binary(
+    frames: bytes = Body(..., media_type="application/octet-stream"),
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    """Fixed-layout binary frames, one or more per body; see app.utils.location_frame"""
+    count = DriverLocationService.update_locations_from_frames(
+        db=db,
+        user=current_user,
+        body=frames
+    )
+    return {"message": "Locations recorded successfully", "count": count}
+
+
+@router.get("/{driver_id}/location-history")
+def stream_driver_location_history(
+    driver_id: int,
+    start: datetime,
+    end: datetime,
+    format: str = Query("ndjson", pattern="^(ndjson|binary)$"),
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    """Stream a driver's location history as NDJSON or binary location frames"""
+    LocationReplayService.authorize_driver(db, current_user, driver_id)
+    start, end = LocationReplayService.validate_range(start, end)
+
+    return StreamingResponse(
+        LocationReplayService.stream(driver_id, start, end, format),
+        media_type="application/octet-stream" if format == "binary" else "application/x-ndjson"
+    )
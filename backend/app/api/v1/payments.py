@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
@@ -19,17 +21,15 @@ def pay_for_trip(
     trip_id: int,
     data: dict,  # {"payment_mode": "ONLINE", "amount": 120}
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    payment = PaymentService.create_payment(
+    # Retries with the same Idempotency-Key get the first response back
+    return PaymentService.create_payment(
         db=db,
         trip_id=trip_id,
         rider_id=current_user.user_id,
         payment_mode=data["payment_mode"],
-        amount=data["amount"]
+        amount=data["amount"],
+        idempotency_key=idempotency_key
     )
-
-    return {
-        "payment_id": payment.payment_id,
-        "status": payment.status
-    }
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
@@ -35,3 +35,11 @@ def reject_driver(
 ):
     TenantAdminService.reject_driver(db, current_user, driver_id)
     return {"message": "Driver rejected successfully"}
+
+@router.get("/balance")
+def get_balance(
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    return TenantAdminService.get_balance(db, current_user, limit)
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
 from app.api.deps.auth import get_current_user
-from app.schemas.trip import TripResponse
+from app.schemas.trip import TripResponse, TripRouteResponse
 from app.models.trips import Trip
 from app.models.identity import AppUser
+from app.services.trip_service import TripService
+from app.services.location_replay_service import LocationReplayService
 
 router = APIRouter(prefix="/trips", tags=["Trips"])
 
@@ -16,12 +19,7 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/{trip_id}", response_model=TripResponse)
-def get_trip_status(
-    trip_id: int,
-    db: Session = Depends(get_db),
-    current_user: AppUser = Depends(get_current_user)
-):
+def _get_visible_trip(db: Session, trip_id: int, current_user: AppUser):
     trip = db.query(Trip).filter(Trip.trip_id == trip_id).first()
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -34,3 +32,38 @@ def get_trip_status(
         raise HTTPException(status_code=403, detail="Not your trip")
 
     return trip
+
+
+@router.get("/{trip_id}", response_model=TripResponse)
+def get_trip_status(
+    trip_id: int,
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    return _get_visible_trip(db, trip_id, current_user)
+
+
+@router.get("/{trip_id}/route", response_model=TripRouteResponse)
+def get_trip_route(
+    trip_id: int,
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    trip = _get_visible_trip(db, trip_id, current_user)
+    return TripService.get_route(db, trip)
+
+
+@router.get("/{trip_id}/location-history")
+def stream_trip_location_history(
+    trip_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|binary)$"),
+    db: Session = Depends(get_db),
+    current_user: AppUser = Depends(get_current_user)
+):
+    """Stream the driver's location history from assignment to completion"""
+    driver_id, start, end = LocationReplayService.trip_window(db, current_user, trip_id)
+
+    return StreamingResponse(
+        LocationReplayService.stream(driver_id, start, end, format),
+        media_type="application/octet-stream" if format == "binary" else "application/x-ndjson"
+    )
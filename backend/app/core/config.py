@@ -0,0 +1,87 @@
+# -----------------------------
+# Dispatch
+# -----------------------------
+DISPATCH_CANDIDATES = 3              # drivers offered each trip
+DRIVER_INDEX_CELL_DEGREES = 0.01     # ~1.1 km grid cells for the driver index
+DRIVER_INDEX_MAX_AGE_SECONDS = 120   # drivers without a fix or heartbeat for this long are not dispatched
+DRIVER_INDEX_REFRESH_SECONDS = 5.0   # positions stored by other workers reach the index this often
+DISPATCH_MODE = "IMMEDIATE"          # IMMEDIATE or BATCHED
+DISPATCH_BATCH_WINDOW_SECONDS = 2.0  # BATCHED: how long trips are gathered per city
+DISPATCH_BATCH_CANDIDATES = 10       # BATCHED: nearest drivers per trip in the cost matrix
+DISPATCH_OFFER_TTL_SECONDS = 20      # unanswered offers expire after this
+DISPATCH_MAX_WAVES = 3               # waves sent before a trip ends in NO_DRIVER
+OFFER_PUSH_QUEUE_SIZE = 100          # undelivered push messages kept per driver connection
+OFFER_PUSH_LISTEN = True             # publish pushes with NOTIFY so drivers on any worker receive them
+
+# -----------------------------
+# Driver location
+# -----------------------------
+LOCATION_BATCH_MAX_FIXES = 500       # fixes accepted per POST /drivers/location/batch
+LOCATION_HISTORY_WRITE_MODE = "BUFFERED"  # BUFFERED (write-behind) or SYNC (in the request transaction)
+LOCATION_HISTORY_FLUSH_ROWS = 1000   # flush the history buffer at this many rows...
+LOCATION_HISTORY_FLUSH_SECONDS = 5.0 # ...or at least this often
+LOCATION_HISTORY_MAX_ROWS = 50000    # memory cap for the history buffer
+LOCATION_HISTORY_PARTITION = "DAY"   # DAY or WEEK range partitions on recorded_at
+LOCATION_HISTORY_PARTITIONS_AHEAD_DAYS = 3    # partitions created ahead of time
+LOCATION_HISTORY_RETENTION_DAYS = 90          # partitions older than this are dropped
+LOCATION_HISTORY_COMPACT_AFTER_DAYS = 7       # partitions older than this are simplified
+LOCATION_HISTORY_SIMPLIFY_METERS = 10.0       # Douglas-Peucker tolerance for compaction
+LOCATION_HISTORY_SEGMENT_GAP_SECONDS = 300    # tracks are split at gaps longer than this
+LOCATION_HISTORY_MAINTENANCE_SECONDS = 3600   # how often partition maintenance runs
+LOCATION_MIN_DISTANCE_METERS = 15.0  # fixes closer than this to the last written one...
+LOCATION_MIN_INTERVAL_SECONDS = 30.0 # ...and newer than this are dropped
+LOCATION_HEARTBEAT_FLUSH_SECONDS = 10.0  # dropped fixes still refresh last_updated this often
+LOCATION_FILTER_MAX_DRIVERS = 100000 # drivers whose last written fix is kept for filtering
+TRIP_ROUTE_CHUNK_POINTS = 200        # route points packed into one trip_route_chunk row
+TRIP_ROUTE_FLUSH_SECONDS = 30.0      # pending route points are written at least this often
+DRIVER_ELIGIBILITY_CACHE_SIZE = 50000     # drivers whose approval/shift state is cached
+DRIVER_ELIGIBILITY_TTL_SECONDS = 15       # bounds staleness of changes made by other workers
+
+# -----------------------------
+# Pricing
+# -----------------------------
+FARE_SNAPSHOT_CHECK_SECONDS = 10     # how often the in-memory fare snapshot checks for changes
+QUOTE_ROAD_FACTOR = 1.3              # road distance / straight-line distance
+QUOTE_AVG_SPEED_KMPH = 24.0          # average city speed for duration estimates
+ZONE_MATCH_MAX_KM = 5.0              # zones without a boundary: max distance to their center
+ZONE_GRID_CELL_DEGREES = 0.01        # grid cells of the zone polygon index
+ZONE_CHECK_SECONDS = 30              # how often zone definitions are checked for changes
+FARE_RULES_CHECK_SECONDS = 30        # how often time-of-day and tax rules are checked for changes
+QUOTE_CACHE_SIZE = 20000             # cached estimate results
+QUOTE_CACHE_TTL_SECONDS = 30         # upper bound on how long an estimate is reused
+QUOTE_GEOHASH_PRECISION = 7          # pickup/drop cells of the quote cache key (~150 m)
+QUOTE_TIME_BUCKET_SECONDS = 60       # estimates are reused within this time bucket
+
+# -----------------------------
+# Surge
+# -----------------------------
+SURGE_TICK_SECONDS = 30              # multipliers are recomputed this often
+SURGE_REQUEST_WINDOW_SECONDS = 600   # unconfirmed ride requests stop counting as demand after this
+SURGE_MIN_DEMAND = 3                 # no surge below this many open requests in a zone
+SURGE_SENSITIVITY = 0.5              # multiplier increase per unit of demand/supply above 1
+SURGE_MAX_MULTIPLIER = 3.0
+SURGE_STEP = 0.1                     # multipliers are rounded down to this step
+
+# -----------------------------
+# Payments
+# -----------------------------
+PLATFORM_WALLET_STRIPES = 16         # platform_wallet rows payments are spread across
+SETTLEMENT_BATCH_SECONDS = 5.0       # how often successful payments are settled in bulk
+SETTLEMENT_BATCH_SIZE = 5000         # payments settled per transaction
+IDEMPOTENCY_KEY_TTL_HOURS = 24       # how long an Idempotency-Key is remembered
+IDEMPOTENCY_CACHE_SIZE = 100000      # completed keys kept in memory for replay
+IDEMPOTENCY_CACHE_TTL_SECONDS = 3600
+LEDGER_SNAPSHOT_SECONDS = 300        # how often ledger balance snapshots are rolled forward
+TENANT_PAYOUT_HOUR_UTC = 2           # tenant payouts run daily at this hour (UTC)
+TENANT_PAYOUT_MIN_AMOUNT = 100       # smaller tenant balances wait for the next run
+TENANT_PAYOUT_CHUNK_SIZE = 200       # tenants settled / paid out per transaction
+TENANT_PAYOUT_BACKEND = None         # key of PAYOUT_BACKENDS in tenant_payout_service; None disables payouts
+TENANT_PAYOUT_ALLOW_LOCAL = False    # development only: "local" marks payouts paid without paying
+
+# -----------------------------
+# Auth
+# -----------------------------
+SESSION_LIFETIME_DAYS = 7            # sessions expire this long after login
+SESSION_CACHE_SIZE = 100000          # validated sessions kept in memory
+SESSION_CACHE_TTL_SECONDS = 300      # bounds staleness when invalidations are not received
+SESSION_CACHE_LISTEN = True          # LISTEN for session/user changes made by other workers
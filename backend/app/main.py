@@ -1,20 +1,81 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import Depends, FastAPI
 from contextlib import asynccontextmanager
 
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
 from app.api.routers import auth
 from app.api.routers import test_protected
 from app.api.v1 import drivers,tenant_admin,riders,ride_requests,pricing,driver_trips,trips
 from app.api.v1 import payments
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import DISPATCH_MODE
+from app.services.driver_index_sync import driver_index_sync
+from app.services.batch_dispatch_service import batch_dispatcher
+from app.services.dispatch_expiry_service import dispatch_scheduler
+from app.services.offer_push_service import offer_hub
+from app.utils.metrics import counters
+from app.api.deps.roles import require_roles
+from app.services.location_history_buffer import location_history_buffer
+from app.services.location_history_maintenance import location_history_maintenance
+from app.services.trip_route_recorder import trip_route_recorder
+from app.services.location_fix_filter import location_fix_filter
+from app.services.surge_service import surge_engine
+from app.services.settlement_batch_service import settlement_batcher
+from app.services.idempotency_service import idempotency_store
+from app.services.ledger_snapshot_service import ledger_snapshots
+from app.services.tenant_payout_service import tenant_payouts
+from app.services.session_cache import session_cache
 
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    offer_hub.bind_loop(asyncio.get_running_loop())
+    offer_hub.start()
+    location_history_maintenance.ensure_partitions()
+
+    db = SessionLocal()
+    try:
+        driver_index_sync.rebuild(db)
+        dispatch_scheduler.recover(db)
+        surge_engine.load(db)
+    finally:
+        db.close()
+
+    driver_index_sync.start()
+    dispatch_scheduler.start()
+    location_history_buffer.start()
+    location_history_maintenance.start()
+    trip_route_recorder.start()
+    location_fix_filter.start()
+    surge_engine.start()
+    settlement_batcher.start()
+    idempotency_store.start()
+    ledger_snapshots.start()
+    tenant_payouts.start()
+    session_cache.start()
+    if DISPATCH_MODE == "BATCHED":
+        batch_dispatcher.start()
+
     yield
 
+    batch_dispatcher.stop()
+    dispatch_scheduler.stop()
+    driver_index_sync.stop()
+    location_history_buffer.stop()
+    location_history_maintenance.stop()
+    trip_route_recorder.stop()
+    location_fix_filter.stop()
+    surge_engine.stop()
+    settlement_batcher.stop()
+    idempotency_store.stop()
+    ledger_snapshots.stop()
+    tenant_payouts.stop()
+    session_cache.stop()
+    offer_hub.stop()
+
 app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
@@ -42,3 +103,9 @@ app.include_router(payments.router)
 @app.get("/")
 def root():
     return {"status": "Backend running"}
+
+
+@app.get("/metrics")
+def metrics(admin = Depends(require_roles("PLATFORM_ADMIN"))):
+    # Counters reveal traffic and failure rates; platform admins only
+    return counters.snapshot()
@@ -41,3 +41,10 @@ class Zone(Base, AuditMixin, GeoMixin):
     longitude = Column("center_lng", Numeric(9, 6))
 
     boundary = Column(String)
+
+class TableVersion(Base):
+    """Counter bumped by a statement trigger on every write to ``table_name``"""
+    __tablename__ = "table_version"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric
+from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric, TIMESTAMP, func, text
 from .base import Base
 from .mixins import AuditMixin
 
+# Transaction that wrote a ledger entry; balance snapshots roll up by it
+CURRENT_TXID = text("(pg_current_xact_id()::text::bigint)")
+
 class PlatformLedger(Base, AuditMixin):
     __tablename__ = "platform_ledger"
 
@@ -10,6 +13,7 @@ class PlatformLedger(Base, AuditMixin):
 
     amount = Column(Numeric(12,2), nullable=False)
     entry_type = Column(String, nullable=False)
+    txid = Column(BigInteger, nullable=False, server_default=CURRENT_TXID)
 
 
 class TenantLedger(Base, AuditMixin):
@@ -21,6 +25,7 @@ class TenantLedger(Base, AuditMixin):
 
     amount = Column(Numeric(12,2), nullable=False)
     entry_type = Column(String, nullable=False)
+    txid = Column(BigInteger, nullable=False, server_default=CURRENT_TXID)
 
 
 class FleetLedger(Base, AuditMixin):
@@ -32,3 +37,17 @@ class FleetLedger(Base, AuditMixin):
 
     amount = Column(Numeric(12,2), nullable=False)
     entry_type = Column(String, nullable=False)
+    txid = Column(BigInteger, nullable=False, server_default=CURRENT_TXID)
+
+
+class LedgerBalanceSnapshot(Base):
+    __tablename__ = "ledger_balance_snapshot"
+
+    ledger = Column(String, primary_key=True)        # PLATFORM / TENANT / FLEET
+    owner_id = Column(BigInteger, primary_key=True)  # tenant_id / fleet_id, 0 for the platform
+
+    as_of_xid = Column(BigInteger, nullable=False)   # entries of earlier transactions are included
+    balance = Column(Numeric(14,2), nullable=False)
+    entry_count = Column(BigInteger, nullable=False)
+
+    updated_on = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, ForeignKey, TIMESTAMP, Numeric
+from sqlalchemy import Column, BigInteger, String, ForeignKey, TIMESTAMP, Numeric, Index
 from .base import Base
 from .mixins import AuditMixin, GeoMixin
 
@@ -27,7 +27,21 @@ class DriverLocation(Base, GeoMixin):
 
 class DriverLocationHistory(Base, GeoMixin):
     __tablename__ = "driver_location_history"
+    __table_args__ = (
+        Index("idx_driver_location_history_driver_time", "driver_id", "recorded_at"),
+        {"postgresql_partition_by": "RANGE (recorded_at)"}
+    )
 
-    id = Column(BigInteger, primary_key=True)
+    # The partition key has to be part of the primary key
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     driver_id = Column(BigInteger, ForeignKey("app_user.user_id", ondelete="CASCADE"), nullable=False)
-    recorded_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    recorded_at = Column(TIMESTAMP(timezone=True), primary_key=True)
+
+
+class DriverLocationHistoryPartition(Base):
+    __tablename__ = "driver_location_history_partition"
+
+    partition_name = Column(String, primary_key=True)
+    range_start = Column(TIMESTAMP(timezone=True), nullable=False)
+    range_end = Column(TIMESTAMP(timezone=True), nullable=False)
+    compacted_at = Column(TIMESTAMP(timezone=True))
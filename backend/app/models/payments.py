@@ -1,4 +1,5 @@
-from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric, TIMESTAMP
+from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric, TIMESTAMP, Integer, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
 from .base import Base
 from .mixins import AuditMixin
 
@@ -13,6 +14,11 @@ class Payment(Base, AuditMixin):
     payment_mode = Column(String, nullable=False)
     status = Column(String, ForeignKey("lu_payment_status.status_code"), nullable=False)
 
+    # Set in the transaction that settles the payment
+    settled_at = Column(TIMESTAMP(timezone=True))
+    # Why settlement gave up on the payment; cleared by hand once fixed
+    settlement_error = Column(Text)
+
 
 class DriverWallet(Base, AuditMixin):
     __tablename__ = "driver_wallet"
@@ -46,6 +52,7 @@ class TenantSettlement(Base, AuditMixin):
 
     requested_at = Column(TIMESTAMP(timezone=True), nullable=False)
     processed_at = Column(TIMESTAMP(timezone=True))
+    payout_reference = Column(String)
 
 
 class Refund(Base, AuditMixin):
@@ -56,3 +63,16 @@ class Refund(Base, AuditMixin):
 
     amount = Column(Numeric(10,2), nullable=False)
     reason = Column(String)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+
+    user_id = Column(BigInteger, ForeignKey("app_user.user_id"), primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)
+
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response = Column(JSONB)
+
+    created_on = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
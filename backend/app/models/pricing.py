@@ -1,6 +1,7 @@
-from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric, TIMESTAMP
+from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric, TIMESTAMP, Time
 from .base import Base
 from .mixins import AuditMixin
+from sqlalchemy.sql import func
 
 class FareConfig(Base, AuditMixin):
     __tablename__ = "fare_config"
@@ -23,9 +24,10 @@ class PricingTimeRule(Base, AuditMixin):
     tenant_id = Column(BigInteger, ForeignKey("tenant.tenant_id"), nullable=False)
     city_id = Column(BigInteger, ForeignKey("city.city_id"), nullable=False)
 
-    rule_type = Column(String(50), nullable=False)
-    start_time = Column(TIMESTAMP, nullable=False)
-    end_time = Column(TIMESTAMP, nullable=False)
+    rule_type = Column(String(50), nullable=False)  # NIGHT, PEAK, ...
+    # Local time of day in the city's timezone; end before start wraps midnight
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
     multiplier = Column(Numeric(5,2), nullable=False)
 
 
@@ -49,3 +51,22 @@ class SurgeEvent(Base, AuditMixin):
 
     started_at = Column(TIMESTAMP(timezone=True), nullable=False)
     ended_at = Column(TIMESTAMP(timezone=True))
+
+
+class TripFareBreakdown(Base):
+    __tablename__ = "trip_fare_breakdown"
+
+    id = Column(BigInteger, primary_key=True)
+    trip_id = Column(BigInteger, ForeignKey("trip.trip_id"), nullable=False)
+
+    base_fare = Column(Numeric(10,2))
+    distance_fare = Column(Numeric(10,2))
+    time_fare = Column(Numeric(10,2))
+    surge_amount = Column(Numeric(10,2))
+    night_charge = Column(Numeric(10,2))
+    tax_amount = Column(Numeric(10,2))
+    discount_amount = Column(Numeric(10,2))
+
+    final_fare = Column(Numeric(10,2), nullable=False)
+
+    created_on = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, ForeignKey, Numeric, TIMESTAMP,DECIMAL,TEXT
+from sqlalchemy import Column, BigInteger, Integer, String, ForeignKey, Numeric, TIMESTAMP,DECIMAL,TEXT,LargeBinary
 from .base import Base
 from .mixins import AuditMixin
 from sqlalchemy.sql import func
@@ -21,6 +21,11 @@ class RideRequest(Base):
         nullable=False
     )
 
+    zone_id = Column(
+        BigInteger,
+        ForeignKey("zone.zone_id")
+    )
+
     pickup_lat = Column(DECIMAL(9, 6), nullable=False)
     pickup_lng = Column(DECIMAL(9, 6), nullable=False)
 
@@ -51,6 +56,9 @@ class Trip(Base, AuditMixin):
 
     city_id = Column(BigInteger, ForeignKey("city.city_id"), nullable=False)
     zone_id = Column(BigInteger, ForeignKey("zone.zone_id"))
+    vehicle_category = Column(String, ForeignKey("lu_vehicle_category.category_code"))
+    # Surge of the tenant and zone when the rider confirmed; the fare uses it
+    surge_multiplier = Column(Numeric(4,2))
 
     pickup_lat = Column(Numeric(9,6), nullable=False)
     pickup_lng = Column(Numeric(9,6), nullable=False)
@@ -58,6 +66,8 @@ class Trip(Base, AuditMixin):
     drop_lng = Column(Numeric(9,6))
 
     status = Column(String, ForeignKey("lu_trip_status.status_code"), nullable=False)
+    # Dispatch wave currently out; advanced by exactly one worker per expiry
+    dispatch_wave = Column(Integer, nullable=False, server_default="1")
 
     requested_at = Column(TIMESTAMP(timezone=True), nullable=False)
     assigned_at = Column(TIMESTAMP(timezone=True))
@@ -70,3 +80,17 @@ class Trip(Base, AuditMixin):
     platform_fee = Column(Numeric(10,2))
 
     payment_status = Column(String, ForeignKey("lu_payment_status.status_code"))
+
+
+class TripRouteChunk(Base):
+    """Route points recorded while a trip is PICKED_UP, see app.utils.route_codec"""
+    __tablename__ = "trip_route_chunk"
+
+    chunk_id = Column(BigInteger, primary_key=True)
+    trip_id = Column(BigInteger, ForeignKey("trip.trip_id", ondelete="CASCADE"), nullable=False, index=True)
+
+    point_count = Column(Integer, nullable=False)
+    started_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    ended_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    points = Column(LargeBinary, nullable=False)
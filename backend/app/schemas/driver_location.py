@@ -1,6 +1,42 @@
-from pydantic import BaseModel
+from datetime import datetime, timezone
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.config import LOCATION_BATCH_MAX_FIXES
 
 
 class DriverLocationUpdateRequest(BaseModel):
     latitude: float
     longitude: float
+
+
+class DriverLocationFix(BaseModel):
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+
+    @field_validator("latitude")
+    def validate_lat(cls, v):
+        if not -90 <= v <= 90:
+            raise ValueError("Invalid latitude")
+        return v
+
+    @field_validator("longitude")
+    def validate_lng(cls, v):
+        if not -180 <= v <= 180:
+            raise ValueError("Invalid longitude")
+        return v
+
+    @field_validator("recorded_at")
+    def assume_utc(cls, v):
+        if v.tzinfo is None:
+            return v.replace(tzinfo=timezone.utc)
+        return v
+
+
+class DriverLocationBatchRequest(BaseModel):
+    fixes: list[DriverLocationFix] = Field(
+        ...,
+        min_length=1,
+        max_length=LOCATION_BATCH_MAX_FIXES
+    )
@@ -10,3 +10,6 @@ class PricingEstimateResponse(BaseModel):
     tenant_name: str
     vehicle_category: str
     estimated_fare: float
+    distance_km: float
+    duration_minutes: float
+    surge_multiplier: float
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import List
+
 from pydantic import BaseModel, field_validator
 
 
@@ -21,6 +24,18 @@ class RiderRequestTrip(BaseModel):
         return v
 
 
+class TripRoutePoint(BaseModel):
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+
+
+class TripRouteResponse(BaseModel):
+    trip_id: int
+    point_count: int
+    points: List[TripRoutePoint]
+
+
 class TripResponse(BaseModel):
     trip_id: int
     status: str
@@ -0,0 +1,246 @@
+import logging
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.core.config import (
+    DISPATCH_CANDIDATES,
+    DISPATCH_BATCH_WINDOW_SECONDS,
+    DISPATCH_BATCH_CANDIDATES,
+    DISPATCH_OFFER_TTL_SECONDS,
+    DISPATCH_MAX_WAVES
+)
+from app.core.database import SessionLocal
+from app.models.trips import Trip
+from app.models.dispatch import DispatchAttempt
+from app.services.dispatch_expiry_service import dispatch_scheduler
+from app.services.offer_push_service import offer_hub
+from app.utils.dispatch_attempt import haversine_batch, assign_batch
+from app.utils.driver_index import driver_index
+from app.services.driver_index_sync import driver_index_sync
+
+logger = logging.getLogger(__name__)
+
+PendingTrip = namedtuple(
+    "PendingTrip",
+    [
+        "trip_id", "tenant_id", "pickup_lat", "pickup_lng",
+        "drop_lat", "drop_lng", "created_by", "queued_at"
+    ]
+)
+
+
+class BatchDispatcher:
+    """
+    Gathers REQUESTED trips per city and dispatches each window as one
+    min-cost assignment over the pickup-distance matrix, so trips created
+    together are not all offered to the same few nearest drivers.
+    """
+
+    def __init__(self, window_seconds: float = DISPATCH_BATCH_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending = defaultdict(list)   # city_id -> [PendingTrip]
+        self._stop = threading.Event()
+        self._thread = None
+
+    def enqueue(self, trip):
+        pending = PendingTrip(
+            trip_id=trip.trip_id,
+            tenant_id=trip.tenant_id,
+            pickup_lat=float(trip.pickup_lat),
+            pickup_lng=float(trip.pickup_lng),
+            drop_lat=trip.drop_lat,
+            drop_lng=trip.drop_lng,
+            created_by=trip.created_by,
+            queued_at=time.monotonic()
+        )
+        with self._lock:
+            self._pending[trip.city_id].append(pending)
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="batch-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.window_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Batch dispatch failed")
+
+    def _requeue(self, city_id, trips):
+        if trips:
+            with self._lock:
+                self._pending[city_id].extend(trips)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+
+        if not pending:
+            return
+
+        # Cancelled or accepted meanwhile: stop matching them
+        try:
+            requested = self._still_requested(
+                [t.trip_id for trips in pending.values() for t in trips]
+            )
+        except Exception:
+            for city_id, trips in pending.items():
+                self._requeue(city_id, trips)
+            raise
+
+        for city_id, trips in pending.items():
+            trips = [t for t in trips if t.trip_id in requested]
+            if not trips:
+                continue
+
+            # One city failing must not lose the others' trips
+            try:
+                offers, unmatched = self._match(city_id, trips)
+
+                if offers:
+                    self._write_offers(offers)
+            except Exception:
+                logger.exception("Batch dispatch failed for city %s", city_id)
+                self._requeue(city_id, trips)
+                continue
+
+            # Give up on trips that waited as long as every wave would have
+            deadline = time.monotonic() - DISPATCH_OFFER_TTL_SECONDS * DISPATCH_MAX_WAVES
+            expired = [t.trip_id for t in unmatched if t.queued_at < deadline]
+            if expired:
+                try:
+                    self._give_up(expired)
+                except Exception:
+                    logger.exception("Giving up on %s trips failed", len(expired))
+                    self._requeue(city_id, [t for t in unmatched if t.queued_at < deadline])
+
+            # Nobody free for the rest yet; try again next window
+            self._requeue(city_id, [t for t in unmatched if t.queued_at >= deadline])
+
+    @staticmethod
+    def _still_requested(trip_ids):
+        db = SessionLocal()
+        try:
+            return {
+                trip_id for (trip_id,) in
+                db.query(Trip.trip_id)
+                .filter(Trip.trip_id.in_(trip_ids), Trip.status == "REQUESTED")
+                .all()
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def _available(driver_ids):
+        db = SessionLocal()
+        try:
+            return driver_index_sync.available_ids(db, driver_ids)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _match(city_id, trips):
+        candidate_ids = set()
+        for trip in trips:
+            for driver_id, _ in driver_index.nearest(
+                trip.pickup_lat,
+                trip.pickup_lng,
+                k=DISPATCH_BATCH_CANDIDATES,
+                city_id=city_id,
+                tenant_id=trip.tenant_id
+            ):
+                candidate_ids.add(driver_id)
+
+        drivers = driver_index.positions(BatchDispatcher._available(candidate_ids))
+        if not drivers:
+            return [], trips
+
+        driver_ids = list(drivers)
+        lats, lngs, tenants = zip(*(drivers[d] for d in driver_ids))
+        tenants = np.array(tenants, dtype=object)
+
+        cost = haversine_batch(
+            [t.pickup_lat for t in trips],
+            [t.pickup_lng for t in trips],
+            lats,
+            lngs
+        )
+        for row, trip in enumerate(trips):
+            if trip.tenant_id is not None:
+                cost[row, tenants != trip.tenant_id] = np.inf
+
+        offers = [
+            (trips[row], driver_ids[col])
+            for row, col in assign_batch(cost, rounds=DISPATCH_CANDIDATES)
+        ]
+        matched = {trip.trip_id for trip, _ in offers}
+
+        return offers, [t for t in trips if t.trip_id not in matched]
+
+    @staticmethod
+    def _write_offers(offers):
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            db.execute(
+                insert(DispatchAttempt),
+                [
+                    {
+                        "trip_id": trip.trip_id,
+                        "driver_id": driver_id,
+                        "sent_at": now,
+                        "response": "SENT",
+                        "created_by": trip.created_by
+                    }
+                    for trip, driver_id in offers
+                ]
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        by_trip = {}
+        for trip, driver_id in offers:
+            by_trip.setdefault(trip, []).append(driver_id)
+
+        for trip, driver_ids in by_trip.items():
+            dispatch_scheduler.track(trip.trip_id)
+            offer_hub.offer(driver_ids, trip)
+
+    @staticmethod
+    def _give_up(trip_ids):
+        db = SessionLocal()
+        try:
+            db.query(Trip).filter(
+                Trip.trip_id.in_(trip_ids),
+                Trip.status == "REQUESTED"
+            ).update(
+                {Trip.status: "NO_DRIVER"},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+batch_dispatcher = BatchDispatcher()
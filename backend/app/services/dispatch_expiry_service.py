@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    DISPATCH_CANDIDATES,
+    DISPATCH_OFFER_TTL_SECONDS,
+    DISPATCH_MAX_WAVES
+)
+from app.core.database import SessionLocal
+from app.models.trips import Trip
+from app.models.dispatch import DispatchAttempt
+from app.services.driver_index_sync import driver_index_sync
+from app.utils.timer_wheel import TimerWheel
+from app.services.offer_push_service import offer_hub
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchExpiryScheduler:
+    """
+    Expires unanswered offers after DISPATCH_OFFER_TTL_SECONDS and sends the
+    trip to a wider set of drivers. A trip still unassigned after
+    DISPATCH_MAX_WAVES waves ends in NO_DRIVER.
+
+    Every worker arms timers for the trips it knows about (and, after
+    ``recover``, for all of them), but trip.dispatch_wave is advanced with
+    a compare-and-set under the trip's row lock: only the first worker to
+    expire a wave sends the next one; the others re-arm for the wave that
+    is now out, so a worker dying still leaves someone to expire it.
+    """
+
+    def __init__(self, ttl_seconds: float = DISPATCH_OFFER_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._wheel = TimerWheel(tick_seconds=1.0)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, trip_id: int, wave: int = 1, delay_seconds: float = None):
+        """(Re)start the offer timer of a trip whose wave was just sent"""
+        if delay_seconds is None:
+            delay_seconds = self.ttl_seconds
+        self._wheel.schedule(trip_id, delay_seconds, payload=wave)
+
+    def cancel(self, trip_id: int):
+        self._wheel.cancel(trip_id)
+
+    def recover(self, db: Session):
+        """Re-arm timers for REQUESTED trips with offers, e.g. after a restart"""
+        now = datetime.now(timezone.utc)
+        rows = (
+            db.query(
+                DispatchAttempt.trip_id,
+                Trip.dispatch_wave,
+                func.max(DispatchAttempt.sent_at)
+            )
+            .join(Trip, Trip.trip_id == DispatchAttempt.trip_id)
+            .filter(Trip.status == "REQUESTED")
+            .group_by(DispatchAttempt.trip_id, Trip.dispatch_wave)
+            .all()
+        )
+
+        for trip_id, wave, last_sent_at in rows:
+            remaining = self.ttl_seconds - (now - last_sent_at).total_seconds()
+            self.track(trip_id, wave=wave, delay_seconds=max(remaining, 0))
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="dispatch-expiry", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        tick = self._wheel.tick_seconds
+        started = time.monotonic()
+        ticks_done = 0
+
+        while not self._stop.wait(tick):
+            # Catch up if a slow wave made us miss ticks
+            ticks_due = int((time.monotonic() - started) / tick)
+            while ticks_done < ticks_due:
+                ticks_done += 1
+                for trip_id, wave in self._wheel.advance():
+                    try:
+                        self._expire(trip_id, wave)
+                    except Exception:
+                        logger.exception("Re-dispatch of trip %s failed", trip_id)
+
+    def _expire(self, trip_id: int, wave: int):
+        db = SessionLocal()
+        try:
+            # Same lock accept_trip takes, so an accept can't interleave
+            trip = (
+                db.query(Trip)
+                .filter(
+                    Trip.trip_id == trip_id,
+                    Trip.status == "REQUESTED"
+                )
+                .with_for_update()
+                .first()
+            )
+
+            if not trip:
+                return
+
+            # Another worker already expired this wave and sent the next one
+            if trip.dispatch_wave != wave:
+                current_wave = trip.dispatch_wave
+                db.rollback()
+                self.track(trip_id, wave=current_wave)
+                return
+
+            now = datetime.now(timezone.utc)
+
+            expired = db.execute(
+                update(DispatchAttempt)
+                .where(
+                    DispatchAttempt.trip_id == trip_id,
+                    DispatchAttempt.response == "SENT"
+                )
+                .values(response="EXPIRED", responded_at=now)
+                .returning(DispatchAttempt.driver_id)
+            ).scalars().all()
+
+            if wave >= DISPATCH_MAX_WAVES:
+                trip.status = "NO_DRIVER"
+                db.commit()
+                offer_hub.revoke(expired, trip_id)
+                logger.info("Trip %s got no driver after %s waves", trip_id, wave)
+                return
+
+            offered = {
+                driver_id
+                for (driver_id,) in db.query(DispatchAttempt.driver_id)
+                .filter(DispatchAttempt.trip_id == trip_id)
+            }
+
+            # Each wave reaches further out than the last
+            next_wave = wave + 1
+            trip.dispatch_wave = next_wave
+            selected_drivers = driver_index_sync.nearest_available(
+                db,
+                trip.pickup_lat,
+                trip.pickup_lng,
+                k=DISPATCH_CANDIDATES * next_wave,
+                city_id=trip.city_id,
+                tenant_id=trip.tenant_id,
+                exclude=offered
+            )
+
+            for driver_id, _ in selected_drivers:
+                db.add(
+                    DispatchAttempt(
+                        trip_id=trip_id,
+                        driver_id=driver_id,
+                        sent_at=now,
+                        response="SENT",
+                        created_by=trip.created_by
+                    )
+                )
+
+            db.commit()
+
+            offer_hub.revoke(expired, trip_id)
+            offer_hub.offer([driver_id for driver_id, _ in selected_drivers], trip)
+        finally:
+            db.close()
+
+        self.track(trip_id, wave=next_wave)
+
+
+dispatch_scheduler = DispatchExpiryScheduler()
@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    DRIVER_ELIGIBILITY_CACHE_SIZE,
+    DRIVER_ELIGIBILITY_TTL_SECONDS
+)
+from app.models.fleet import DriverProfile
+from app.models.operations import DriverShift
+from app.models.trips import Trip
+from app.utils.metrics import counters
+from app.utils.ttl_cache import TTLCache, MISSING
+
+DriverEligibility = namedtuple(
+    "DriverEligibility",
+    ["driver_id", "tenant_id", "approval_status", "shift_id", "active_trip_id"]
+)
+
+
+class DriverEligibilityCache:
+    """
+    Caches what location updates and trip offers check on every call: the
+    driver's approval status, tenant, open shift and PICKED_UP trip.
+
+    Entries are invalidated explicitly whenever a profile is created,
+    approved or rejected, whenever a shift starts or ends and whenever a
+    trip is picked up or completed; a load that races an invalidation is
+    not cached. The TTL only bounds staleness for changes made by another
+    worker process, so decisions that must not act on a stale approval
+    (accepting a trip) read the database instead.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            max_entries=DRIVER_ELIGIBILITY_CACHE_SIZE,
+            ttl_seconds=DRIVER_ELIGIBILITY_TTL_SECONDS
+        )
+
+    def get(self, db: Session, driver_id: int):
+        """Return the driver's ``DriverEligibility``, or None without a profile"""
+        eligibility = self._cache.get(driver_id)
+        if eligibility is not MISSING:
+            counters.inc("driver_eligibility.hit")
+            return eligibility
+
+        counters.inc("driver_eligibility.miss")
+        generation = self._cache.generation(driver_id)
+        eligibility = self._load(db, driver_id)
+        self._cache.set_if_current(driver_id, eligibility, generation)
+        return eligibility
+
+    def invalidate(self, driver_id: int):
+        self._cache.invalidate(driver_id)
+
+    @staticmethod
+    def _load(db: Session, driver_id: int):
+        row = (
+            db.query(
+                DriverProfile.tenant_id,
+                DriverProfile.approval_status,
+                DriverShift.shift_id,
+                Trip.trip_id
+            )
+            .outerjoin(
+                DriverShift,
+                (DriverShift.driver_id == DriverProfile.driver_id)
+                & DriverShift.ended_at.is_(None)
+            )
+            .outerjoin(
+                Trip,
+                (Trip.driver_id == DriverProfile.driver_id)
+                & (Trip.status == "PICKED_UP")
+            )
+            .filter(DriverProfile.driver_id == driver_id)
+            .first()
+        )
+
+        if not row:
+            return None
+
+        tenant_id, approval_status, shift_id, trip_id = row
+        return DriverEligibility(driver_id, tenant_id, approval_status, shift_id, trip_id)
+
+
+driver_eligibility = DriverEligibilityCache()
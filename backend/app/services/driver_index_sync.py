@@ -0,0 +1,222 @@
+import logging
+import select
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from app.core.config import DRIVER_INDEX_MAX_AGE_SECONDS, DRIVER_INDEX_REFRESH_SECONDS
+from app.core.database import SessionLocal, engine
+from app.models.fleet import DriverProfile
+from app.models.identity import AppUser
+from app.models.operations import DriverLocation, DriverShift
+from app.utils.driver_index import driver_index
+from app.utils.metrics import counters
+
+logger = logging.getLogger(__name__)
+
+# Sent by the driver_shift / driver_profile triggers, see RideSharing.sql
+REMOVAL_CHANNEL = "driver_index_removal"
+
+
+def _dispatchable(db: Session, since: datetime, driver_ids=None):
+    """Approved, on-shift drivers with a fix or heartbeat since ``since``"""
+    query = (
+        db.query(
+            DriverProfile.driver_id,
+            AppUser.city_id,
+            DriverProfile.tenant_id,
+            DriverLocation.latitude,
+            DriverLocation.longitude,
+            DriverLocation.last_updated
+        )
+        .join(AppUser, AppUser.user_id == DriverProfile.driver_id)
+        .join(DriverShift, DriverShift.driver_id == DriverProfile.driver_id)
+        .join(DriverLocation, DriverLocation.driver_id == DriverProfile.driver_id)
+        .filter(
+            DriverProfile.approval_status == "APPROVED",
+            DriverShift.ended_at.is_(None),
+            DriverLocation.last_updated >= since
+        )
+    )
+    if driver_ids is not None:
+        query = query.filter(DriverProfile.driver_id.in_(driver_ids))
+    return query.all()
+
+
+class DriverIndexSync:
+    """
+    Keeps this worker's ``driver_index`` in line with the database, which
+    every worker writes to:
+
+    - LISTENs on REMOVAL_CHANNEL, which triggers notify when a shift ends
+      or a driver loses approval, including changes made outside the app;
+    - every DRIVER_INDEX_REFRESH_SECONDS picks up the positions and
+      heartbeats stored since the last refresh, whichever worker stored
+      them;
+    - drops drivers with no fix or heartbeat for DRIVER_INDEX_MAX_AGE_SECONDS.
+
+    The index is rebuilt after every successful LISTEN, since removals may
+    have been missed while not listening. Dispatch still re-checks the
+    drivers it picks (``nearest_available``), so a removal in flight never
+    reaches an offer.
+    """
+
+    def __init__(self):
+        self._refreshed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- loading ---------------------------------------------------
+
+    @staticmethod
+    def _upsert(row):
+        driver_id, city_id, tenant_id, latitude, longitude, last_updated = row
+        driver_index.upsert(
+            driver_id, city_id, tenant_id, latitude, longitude,
+            seen_at=last_updated.timestamp()
+        )
+
+    def rebuild(self, db: Session):
+        """Load every approved, on-shift, recently located driver into the index"""
+        now = datetime.now(timezone.utc)
+        drivers = _dispatchable(db, now - timedelta(seconds=DRIVER_INDEX_MAX_AGE_SECONDS))
+
+        driver_index.clear()
+        for row in drivers:
+            self._upsert(row)
+        self._refreshed_at = now
+
+    def refresh(self, db: Session):
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(seconds=DRIVER_INDEX_MAX_AGE_SECONDS)
+        # Overlap the last refresh: positions committed during it may carry
+        # an earlier last_updated than its start
+        since = cutoff
+        if self._refreshed_at:
+            since = max(cutoff, self._refreshed_at - timedelta(seconds=DRIVER_INDEX_REFRESH_SECONDS))
+
+        for row in _dispatchable(db, since):
+            self._upsert(row)
+        self._refreshed_at = now
+
+        evicted = driver_index.evict_older_than(cutoff.timestamp())
+        counters.inc("driver_index.evicted", evicted)
+
+    # ---- dispatch --------------------------------------------------
+
+    @staticmethod
+    def available_ids(db: Session, driver_ids) -> set:
+        """
+        The ``driver_ids`` still approved, on shift and recently located,
+        in one query; the others are dropped from the index.
+        """
+        driver_ids = list(driver_ids)
+        if not driver_ids:
+            return set()
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=DRIVER_INDEX_MAX_AGE_SECONDS)
+        available = {row[0] for row in _dispatchable(db, cutoff, driver_ids)}
+
+        for driver_id in driver_ids:
+            if driver_id not in available:
+                driver_index.remove(driver_id)
+                counters.inc("driver_index.stale_candidates")
+        return available
+
+    def nearest_available(
+        self,
+        db: Session,
+        latitude,
+        longitude,
+        k: int,
+        city_id=None,
+        tenant_id=None,
+        exclude=()
+    ):
+        """``driver_index.nearest`` restricted to drivers the database still lets us dispatch"""
+        exclude = set(exclude)
+        found = []
+        while len(found) < k:
+            candidates = driver_index.nearest(
+                latitude,
+                longitude,
+                k=k - len(found),
+                city_id=city_id,
+                tenant_id=tenant_id,
+                exclude=exclude
+            )
+            if not candidates:
+                break
+
+            available = self.available_ids(db, [driver_id for driver_id, _ in candidates])
+            found.extend(c for c in candidates if c[0] in available)
+            if len(available) == len(candidates):
+                break
+            exclude.update(driver_id for driver_id, _ in candidates)
+
+        return sorted(found, key=lambda candidate: candidate[1])
+
+    # ---- lifecycle -------------------------------------------------
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="driver-index-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Driver index sync failed")
+            self._stop.wait(5)
+
+    def _with_session(self, step):
+        db = SessionLocal()
+        try:
+            step(db)
+        finally:
+            db.close()
+
+    def _listen(self):
+        connection = engine.raw_connection()
+        try:
+            dbapi = connection.dbapi_connection
+            dbapi.autocommit = True
+            cursor = dbapi.cursor()
+            cursor.execute(f"LISTEN {REMOVAL_CHANNEL}")
+            cursor.close()
+
+            # Removals may have been missed while not listening
+            self._with_session(self.rebuild)
+            next_refresh = time.monotonic() + DRIVER_INDEX_REFRESH_SECONDS
+
+            while not self._stop.is_set():
+                timeout = max(next_refresh - time.monotonic(), 0)
+                if select.select([dbapi], [], [], min(timeout, 1.0))[0]:
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        driver_index.remove(int(dbapi.notifies.pop(0).payload))
+                        counters.inc("driver_index.remote_removals")
+
+                if time.monotonic() >= next_refresh:
+                    self._with_session(self.refresh)
+                    next_refresh = time.monotonic() + DRIVER_INDEX_REFRESH_SECONDS
+        finally:
+            connection.invalidate()
+
+
+driver_index_sync = DriverIndexSync()
@@ -1,85 +1,197 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 
 from app.models.fleet import DriverProfile
-from app.models.operations import DriverShift,DriverLocation,DriverLocationHistory
+from app.models.operations import DriverShift,DriverLocation
 from app.models.identity import AppUser
+from app.core.config import LOCATION_BATCH_MAX_FIXES
+from app.utils.location_frame import decode_frames, COORD_SCALE
+from app.utils.route_codec import from_epoch_ms
+from app.utils.driver_index import driver_index
+from app.services.location_history_buffer import location_history_buffer
+from app.services.driver_eligibility_cache import driver_eligibility
+from app.services.trip_route_recorder import trip_route_recorder
+from app.services.location_fix_filter import location_fix_filter, Fix
 
 
 class DriverLocationService:
 
     @staticmethod
-    def update_location(
-        db: Session,
-        user: AppUser,
-        latitude: float,
-        longitude: float
-    ):
+    def _get_on_shift_profile(db: Session, user: AppUser):
         if user.role != "DRIVER":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Only drivers can update location"
             )
 
-        profile = (
-            db.query(DriverProfile)
-            .filter(DriverProfile.driver_id == user.user_id)
-            .first()
-        )
+        eligibility = driver_eligibility.get(db, user.user_id)
 
-        if not profile or profile.approval_status != "APPROVED":
+        if not eligibility or eligibility.approval_status != "APPROVED":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Driver is not approved"
             )
 
-        active_shift = (
-            db.query(DriverShift)
-            .filter(
-                DriverShift.driver_id == user.user_id,
-                DriverShift.ended_at.is_(None)
-            )
-            .first()
-        )
-
-        if not active_shift:
+        if eligibility.shift_id is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Driver does not have an active shift"
             )
 
+        return eligibility
+
+    @staticmethod
+    def update_location(
+        db: Session,
+        user: AppUser,
+        latitude: float,
+        longitude: float
+    ):
+        profile = DriverLocationService._get_on_shift_profile(db, user)
+
         now = datetime.now(timezone.utc)
 
-        # Upsert latest location
-        location = (
-            db.query(DriverLocation)
-            .filter(DriverLocation.driver_id == user.user_id)
-            .first()
+        # Parked drivers: only a heartbeat, no write
+        if not location_fix_filter.thin(user.user_id, [Fix(latitude, longitude, now)]):
+            return
+
+        moved = DriverLocationService._upsert_position(
+            db, user.user_id, latitude, longitude, now
+        )
+        location_history_buffer.record(
+            db, [(user.user_id, latitude, longitude, now)]
         )
 
-        if location:
-            location.latitude = latitude
-            location.longitude = longitude
-            location.last_updated = now
-        else:
-            location = DriverLocation(
+        db.commit()
+
+        # The index follows the stored position, not a fix that lost to a newer one
+        if moved:
+            driver_index.upsert(
                 driver_id=user.user_id,
+                city_id=user.city_id,
+                tenant_id=profile.tenant_id,
                 latitude=latitude,
                 longitude=longitude,
-                last_updated=now
+                seen_at=now.timestamp()
             )
-            db.add(location)
 
-        # Insert history
-        history = DriverLocationHistory(
-            driver_id=user.user_id,
+        if profile.active_trip_id:
+            trip_route_recorder.record(
+                profile.active_trip_id, [(latitude, longitude, now)]
+            )
+
+    @staticmethod
+    def _upsert_position(db: Session, driver_id: int, latitude, longitude, recorded_at):
+        """Single-statement upsert of the live position; False if it was newer"""
+        upsert = pg_insert(DriverLocation).values(
+            driver_id=driver_id,
             latitude=latitude,
             longitude=longitude,
-            recorded_at=now
+            last_updated=recorded_at
+        )
+        # A late fix must not move the live position back in time
+        moved = db.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[DriverLocation.driver_id],
+                set_={
+                    "latitude": upsert.excluded.latitude,
+                    "longitude": upsert.excluded.longitude,
+                    "last_updated": upsert.excluded.last_updated
+                },
+                where=DriverLocation.last_updated < upsert.excluded.last_updated
+            )
+            .returning(DriverLocation.driver_id)
+        ).first()
+
+        return moved is not None
+
+    @staticmethod
+    def update_locations(db: Session, user: AppUser, fixes):
+        """
+        Ingest a batch of timestamped fixes, e.g. queued by the app while
+        offline: one bulk history write and one upsert of the live position.
+        """
+        profile = DriverLocationService._get_on_shift_profile(db, user)
+
+        # Client clocks drift; never record a fix in the future
+        now = datetime.now(timezone.utc)
+        received = sorted(
+            (
+                Fix(fix.latitude, fix.longitude, min(fix.recorded_at, now))
+                for fix in fixes
+            ),
+            key=lambda fix: fix.recorded_at
+        )
+
+        kept = location_fix_filter.thin(user.user_id, received)
+        if not kept:
+            return len(received)
+
+        rows = [
+            (user.user_id, fix.latitude, fix.longitude, fix.recorded_at)
+            for fix in kept
+        ]
+
+        location_history_buffer.record(db, rows)
+
+        _, latitude, longitude, recorded_at = rows[-1]
+        moved = DriverLocationService._upsert_position(
+            db, user.user_id, latitude, longitude, recorded_at
         )
 
-        db.add(history)
         db.commit()
 
+        if moved:
+            driver_index.upsert(
+                driver_id=user.user_id,
+                city_id=user.city_id,
+                tenant_id=profile.tenant_id,
+                latitude=latitude,
+                longitude=longitude,
+                seen_at=recorded_at.timestamp()
+            )
+
+        if profile.active_trip_id:
+            trip_route_recorder.record(
+                profile.active_trip_id,
+                [(lat, lng, recorded_at) for _, lat, lng, recorded_at in rows]
+            )
+
+        return len(received)
+
+    @staticmethod
+    def update_locations_from_frames(db: Session, user: AppUser, body: bytes):
+        """Binary counterpart of ``update_locations``, see app.utils.location_frame"""
+        try:
+            frames = decode_frames(body)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+        if len(frames) > LOCATION_BATCH_MAX_FIXES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {LOCATION_BATCH_MAX_FIXES} fixes per request"
+            )
+
+        if (frames["driver_id"] != user.user_id).any():
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Frames must carry the caller's driver id"
+            )
+
+        # Heading and speed are validated but not stored yet
+        fixes = [
+            Fix(lat, lng, from_epoch_ms(ms))
+            for lat, lng, ms in zip(
+                (frames["lat_e7"] / COORD_SCALE).tolist(),
+                (frames["lng_e7"] / COORD_SCALE).tolist(),
+                frames["recorded_at_ms"].tolist()
+            )
+        ]
 
+        return DriverLocationService.update_locations(db, user, fixes)
@@ -4,6 +4,7 @@ from fastapi import HTTPException, status
 from app.models.fleet import DriverProfile
 from app.models.identity import AppUser
 from app.schemas.driver import DriverApplyRequest
+from app.services.driver_eligibility_cache import driver_eligibility
 
 class DriverService:
 
@@ -46,6 +47,9 @@ class DriverService:
         db.commit()
         db.refresh(driver_profile)
 
+        # A "no profile" answer may be cached from before the application
+        driver_eligibility.invalidate(user.user_id)
+
         return driver_profile
     
     @staticmethod
@@ -3,8 +3,11 @@ from fastapi import HTTPException, status
 from datetime import datetime, timezone
 
 from app.models.fleet import DriverProfile
-from app.models.operations import DriverShift
+from app.models.operations import DriverShift, DriverLocation
 from app.models.identity import AppUser
+from app.utils.driver_index import driver_index
+from app.services.driver_eligibility_cache import driver_eligibility
+from app.services.location_fix_filter import location_fix_filter
 
 
 class DriverShiftService:
@@ -62,6 +65,26 @@ class DriverShiftService:
         db.commit()
         db.refresh(shift)
 
+        driver_eligibility.invalidate(user.user_id)
+        location_fix_filter.forget(user.user_id)
+
+        # Driver is dispatchable again from their last known position
+        location = (
+            db.query(DriverLocation)
+            .filter(DriverLocation.driver_id == user.user_id)
+            .first()
+        )
+
+        if location:
+            driver_index.upsert(
+                driver_id=user.user_id,
+                city_id=user.city_id,
+                tenant_id=profile.tenant_id,
+                latitude=location.latitude,
+                longitude=location.longitude,
+                seen_at=location.last_updated.timestamp()
+            )
+
         return shift
     
     @staticmethod
@@ -92,3 +115,6 @@ class DriverShiftService:
 
         db.commit()
 
+        driver_eligibility.invalidate(user.user_id)
+        driver_index.remove(user.user_id)
+
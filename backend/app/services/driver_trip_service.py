@@ -1,20 +1,23 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models.trips import Trip
-from app.models.dispatch import DispatchAttempt
 from app.models.fleet import DriverProfile
+from app.models.operations import DriverShift
+from app.models.dispatch import DispatchAttempt
+from app.services.driver_eligibility_cache import driver_eligibility
+from app.services.fare_service import FareService
+from app.services.trip_route_recorder import trip_route_recorder
+from app.services.dispatch_expiry_service import dispatch_scheduler
+from app.services.offer_push_service import offer_hub
+from app.utils.metrics import counters
 from datetime import timezone,datetime
-from sqlalchemy import and_
+from sqlalchemy import update, exists, select, case
 class DriverTripService:
 
     @staticmethod
     def get_trip_offers(db: Session, driver_id: int):
         # Check if driver is approved
-        profile = (
-            db.query(DriverProfile)
-            .filter(DriverProfile.driver_id == driver_id)
-            .first()
-        )
+        profile = driver_eligibility.get(db, driver_id)
 
         if not profile:
             raise HTTPException(
@@ -51,14 +54,21 @@ class DriverTripService:
         ]
     @staticmethod
     def accept_trip(db: Session, driver_id: int, trip_id: int):
-        # Check if driver is approved
+        # Check if driver is approved and on shift; read the database,
+        # another worker may have changed either within the eligibility
+        # cache's TTL
         profile = (
-            db.query(DriverProfile)
+            db.query(DriverProfile.approval_status, DriverShift.shift_id)
+            .outerjoin(
+                DriverShift,
+                (DriverShift.driver_id == DriverProfile.driver_id)
+                & DriverShift.ended_at.is_(None)
+            )
             .filter(DriverProfile.driver_id == driver_id)
             .first()
         )
 
-        if not profile:
+        if profile is None:
             raise HTTPException(
                 status_code=404,
                 detail="Driver profile not found"
@@ -70,53 +80,73 @@ class DriverTripService:
                 detail="Driver is not approved to accept trips"
             )
 
-        trip = (
-            db.query(Trip)
-            .filter(
-                Trip.trip_id == trip_id,
-                Trip.status == "REQUESTED"
+        if profile.shift_id is None:
+            raise HTTPException(
+                status_code=403,
+                detail="Driver does not have an active shift"
             )
-            .with_for_update()
-            .first()
-        )
 
-        if not trip:
-            raise HTTPException(400, "Trip already assigned")
+        now = datetime.now(timezone.utc)
 
-        attempt = (
-            db.query(DispatchAttempt)
-            .filter(
-                DispatchAttempt.trip_id == trip_id,
-                DispatchAttempt.driver_id == driver_id
+        # Compare-and-set: the trip only moves to ASSIGNED if it is still
+        # REQUESTED and this driver holds a live offer. The outer statement
+        # settles every offer of the trip in the same round trip.
+        assigned = (
+            update(Trip)
+            .where(
+                Trip.trip_id == trip_id,
+                Trip.status == "REQUESTED",
+                exists().where(
+                    DispatchAttempt.trip_id == trip_id,
+                    DispatchAttempt.driver_id == driver_id,
+                    DispatchAttempt.response == "SENT"
+                )
             )
-            .first()
+            .values(driver_id=driver_id, status="ASSIGNED", assigned_at=now)
+            .returning(Trip.trip_id)
+            .cte("assigned")
         )
 
-        if not attempt:
-            raise HTTPException(403, "No dispatch for this driver")
-
-        # Assign trip
-        trip.driver_id = driver_id
-        trip.status = "ASSIGNED"
-        trip.assigned_at = datetime.now(timezone.utc)
+        settled = db.execute(
+            update(DispatchAttempt)
+            .where(
+                DispatchAttempt.trip_id.in_(select(assigned.c.trip_id)),
+                DispatchAttempt.response == "SENT"
+            )
+            .values(
+                response=case(
+                    (DispatchAttempt.driver_id == driver_id, "ACCEPTED"),
+                    else_="REJECTED"
+                ),
+                responded_at=now
+            )
+            .returning(DispatchAttempt.driver_id, DispatchAttempt.response)
+        ).all()
 
-        # Update dispatch attempts
-        attempt.response = "ACCEPTED"
-        attempt.responded_at = datetime.now(timezone.utc)
+        if not any(response == "ACCEPTED" for _, response in settled):
+            db.rollback()
 
-        db.query(DispatchAttempt).filter(
-            and_(
-                DispatchAttempt.trip_id == trip_id,
-                DispatchAttempt.driver_id != driver_id
+            trip_status = (
+                db.query(Trip.status)
+                .filter(Trip.trip_id == trip_id)
+                .scalar()
             )
-        ).update(
-            {
-                DispatchAttempt.response: "REJECTED",
-                DispatchAttempt.responded_at: datetime.now(timezone.utc)
-            }
-        )
+
+            if trip_status != "REQUESTED":
+                counters.inc("trip_accept.conflict")
+                raise HTTPException(400, "Trip already assigned")
+
+            counters.inc("trip_accept.no_offer")
+            raise HTTPException(403, "No active offer for this driver")
+
+        counters.inc("trip_accept.won")
+        revoked = [d for d, response in settled if response == "REJECTED"]
 
         db.commit()
+
+        dispatch_scheduler.cancel(trip_id)
+        offer_hub.revoke(revoked, trip_id)
+
         return {"message": "Trip accepted"}
 
     @staticmethod
@@ -138,6 +168,9 @@ class DriverTripService:
         trip.picked_up_at = datetime.now(timezone.utc)
 
         db.commit()
+
+        # Location updates start recording the route from here
+        driver_eligibility.invalidate(driver_id)
         return {"message": "Trip started"}
 
     @staticmethod
@@ -158,7 +191,11 @@ class DriverTripService:
         trip.status = "COMPLETED"
         trip.completed_at = datetime.now(timezone.utc)
 
+        trip_route_recorder.finish(db, trip_id)
+        FareService.finalize(db, trip)
         db.commit()
+
+        driver_eligibility.invalidate(driver_id)
         return {"message": "Trip completed"}
     
     
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy.orm import Session
+
+from app.core.config import FARE_RULES_CHECK_SECONDS
+from app.models.core import City
+from app.models.pricing import PricingTimeRule
+from app.models.tenant import TenantTaxRule
+from app.utils.intervals import IntervalLookup
+from app.utils.versioned_snapshot import VersionedSnapshot, table_version_sql
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def _second_of_day(t) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _city_zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return timezone.utc
+
+
+class FareRules:
+    """
+    Time-of-day multipliers (pricing_time_rule) and effective-dated tax
+    rates (tenant_tax_rule), answered from memory.
+
+    Time rules are held per (tenant, city) as an IntervalLookup over the
+    second of the local day; a rule whose end is before its start wraps
+    midnight. Tax rules are held per (tenant, country) as an IntervalLookup
+    over epoch seconds. Each lookup is one binary search however many
+    rules there are. The rules are reloaded only when one of the tables
+    changes, checked at most every FARE_RULES_CHECK_SECONDS.
+    """
+
+    def __init__(self):
+        self._snapshot = VersionedSnapshot(
+            table_version_sql(
+                PricingTimeRule.__tablename__,
+                TenantTaxRule.__tablename__,
+                City.__tablename__
+            ),
+            self._load,
+            FARE_RULES_CHECK_SECONDS
+        )
+
+    def time_rules_at(self, db: Session, tenant_id: int, city_id: int, at: datetime):
+        """``(rule_type, multiplier)`` of every time rule active at ``at``"""
+        rules = self._snapshot.get(db)
+        lookup = rules["time"].get((tenant_id, city_id))
+        if not lookup:
+            return ()
+
+        tz = rules["cities"].get(city_id, (timezone.utc, None))[0]
+        return lookup.at(_second_of_day(at.astimezone(tz)))
+
+    def time_multiplier(self, db: Session, tenant_id: int, city_id: int, at: datetime) -> float:
+        multiplier = 1.0
+        for _, m in self.time_rules_at(db, tenant_id, city_id, at):
+            multiplier *= m
+        return multiplier
+
+    def taxes_at(self, db: Session, tenant_id: int, city_id: int, at: datetime):
+        """``(tax_type, rate_percent)`` of every tax in effect at ``at`` in the city's country"""
+        rules = self._snapshot.get(db)
+        country_code = rules["cities"].get(city_id, (None, None))[1]
+        lookup = rules["tax"].get((tenant_id, country_code))
+        if not lookup:
+            return ()
+        return lookup.at(at.timestamp())
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def invalidate(self):
+        self._snapshot.invalidate()
+
+    @staticmethod
+    def _load(db: Session):
+        time_intervals = {}
+        for rule in db.query(PricingTimeRule).all():
+            start = _second_of_day(rule.start_time)
+            end = _second_of_day(rule.end_time)
+            value = (rule.rule_type, float(rule.multiplier))
+            intervals = time_intervals.setdefault((rule.tenant_id, rule.city_id), [])
+
+            if start < end:
+                intervals.append((start, end, value))
+            else:
+                # Wraps midnight; equal times mean all day
+                intervals.append((start, SECONDS_PER_DAY, value))
+                if end:
+                    intervals.append((0, end, value))
+
+        tax_intervals = {}
+        for rule in db.query(TenantTaxRule).all():
+            tax_intervals.setdefault((rule.tenant_id, rule.country_code), []).append((
+                rule.effective_from.timestamp(),
+                rule.effective_to.timestamp() if rule.effective_to else None,
+                (rule.tax_type, float(rule.rate))
+            ))
+
+        return {
+            "time": {key: IntervalLookup(v) for key, v in time_intervals.items()},
+            "tax": {key: IntervalLookup(v) for key, v in tax_intervals.items()},
+            "cities": {
+                city_id: (_city_zone(tz_name), country_code)
+                for city_id, tz_name, country_code in
+                db.query(City.city_id, City.timezone, City.country_code).all()
+            }
+        }
+
+
+fare_rules = FareRules()
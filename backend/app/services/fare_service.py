@@ -0,0 +1,170 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy.orm import Session
+
+from app.core.config import QUOTE_AVG_SPEED_KMPH
+from app.models.pricing import FareConfig, TripFareBreakdown
+from app.models.trips import Trip
+from app.models.vehicle import Vehicle, DriverVehicleAssignment
+from app.services.fare_rules import fare_rules
+from app.services.fare_snapshot import fare_snapshot
+from app.services.pricing_service import PricingService
+from app.services.surge_service import surge_engine
+from app.services.trip_service import TripService
+from app.utils.dispatch_attempt import haversine
+
+CENT = Decimal("0.01")
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class FareService:
+
+    @staticmethod
+    def _vehicle_category(db: Session, trip: Trip):
+        if trip.vehicle_category:
+            return trip.vehicle_category
+
+        if trip.vehicle_id:
+            return (
+                db.query(Vehicle.category)
+                .filter(Vehicle.vehicle_id == trip.vehicle_id)
+                .scalar()
+            )
+
+        return (
+            db.query(Vehicle.category)
+            .join(DriverVehicleAssignment, DriverVehicleAssignment.vehicle_id == Vehicle.vehicle_id)
+            .filter(
+                DriverVehicleAssignment.driver_id == trip.driver_id,
+                DriverVehicleAssignment.end_time.is_(None)
+            )
+            .scalar()
+        )
+
+    @staticmethod
+    def _rates(db: Session, trip: Trip, category):
+        """``(base_fare, per_km, per_minute, minimum_fare)`` of the trip's tenant and category"""
+        fares = fare_snapshot.for_city(db, trip.city_id)
+        if fares:
+            for i, (tenant_id, fare_category) in enumerate(
+                zip(fares.tenant_ids, fares.vehicle_categories)
+            ):
+                if tenant_id == trip.tenant_id and (category is None or fare_category == category):
+                    return (
+                        float(fares.base_fare[i]),
+                        float(fares.per_km[i]),
+                        float(fares.per_minute[i]),
+                        float(fares.minimum_fare[i])
+                    )
+
+        # Tenant no longer ACTIVE: it still gets paid for the trip
+        query = db.query(
+            FareConfig.base_fare,
+            FareConfig.per_km,
+            FareConfig.per_minute,
+            FareConfig.minimum_fare
+        ).filter(
+            FareConfig.tenant_id == trip.tenant_id,
+            FareConfig.city_id == trip.city_id
+        )
+        if category:
+            query = query.filter(FareConfig.vehicle_category == category)
+
+        row = query.first()
+        return tuple(float(v) for v in row) if row else None
+
+    @staticmethod
+    def _distance_and_duration(db: Session, trip: Trip):
+        """Driven km from the recorded route and minutes from pickup to drop-off"""
+        points = TripService.get_route(db, trip)["points"]
+
+        if len(points) >= 2:
+            distance_km = sum(
+                haversine(a["latitude"], a["longitude"], b["latitude"], b["longitude"])
+                for a, b in zip(points, points[1:])
+            )
+        elif trip.drop_lat is not None:
+            distance_km, _ = PricingService.estimate_route(
+                trip.pickup_lat, trip.pickup_lng, trip.drop_lat, trip.drop_lng
+            )
+        else:
+            distance_km = 0.0
+
+        if trip.picked_up_at and trip.completed_at:
+            duration_minutes = (trip.completed_at - trip.picked_up_at).total_seconds() / 60
+        else:
+            duration_minutes = distance_km / QUOTE_AVG_SPEED_KMPH * 60
+
+        return distance_km, duration_minutes
+
+    @staticmethod
+    def finalize(db: Session, trip: Trip):
+        """
+        Price a completed trip: fare config, time-of-day rules in effect at
+        pickup, the surge the rider confirmed at and the taxes in effect at
+        drop-off.
+        Adds the trip_fare_breakdown row and sets ``trip.fare_amount``; the
+        caller commits. Returns None if the tenant has no fare configured.
+        """
+        rates = FareService._rates(db, trip, FareService._vehicle_category(db, trip))
+        if not rates:
+            return None
+
+        base, per_km, per_minute, minimum = rates
+        distance_km, duration_minutes = FareService._distance_and_duration(db, trip)
+
+        base_fare = _money(base)
+        distance_fare = _money(per_km * distance_km)
+        time_fare = _money(per_minute * duration_minutes)
+
+        # The minimum fare tops up the base fare so the parts still add up
+        subtotal = base_fare + distance_fare + time_fare
+        if subtotal < _money(minimum):
+            base_fare += _money(minimum) - subtotal
+            subtotal = _money(minimum)
+
+        night = other = 1.0
+        for rule_type, multiplier in fare_rules.time_rules_at(
+            db, trip.tenant_id, trip.city_id, trip.picked_up_at or trip.requested_at
+        ):
+            if rule_type == "NIGHT":
+                night *= multiplier
+            else:
+                other *= multiplier
+
+        night_charge = _money(float(subtotal) * (night - 1))
+        after_night = subtotal + night_charge
+
+        # Trips confirmed before the quoted surge was stored get the live one
+        if trip.surge_multiplier is not None:
+            quoted = float(trip.surge_multiplier)
+        else:
+            quoted = surge_engine.multiplier(trip.tenant_id, trip.zone_id)
+        surge = other * quoted
+        surge_amount = _money(float(after_night) * (surge - 1))
+        after_surge = after_night + surge_amount
+
+        tax_rate = sum(
+            rate for _, rate in
+            fare_rules.taxes_at(db, trip.tenant_id, trip.city_id, trip.completed_at)
+        )
+        tax_amount = _money(float(after_surge) * tax_rate / 100)
+
+        breakdown = TripFareBreakdown(
+            trip_id=trip.trip_id,
+            base_fare=base_fare,
+            distance_fare=distance_fare,
+            time_fare=time_fare,
+            surge_amount=surge_amount,
+            night_charge=night_charge,
+            tax_amount=tax_amount,
+            discount_amount=_money(0),
+            final_fare=after_surge + tax_amount
+        )
+        db.add(breakdown)
+        trip.fare_amount = breakdown.final_fare
+
+        return breakdown
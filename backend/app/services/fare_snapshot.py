@@ -0,0 +1,85 @@
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import FARE_SNAPSHOT_CHECK_SECONDS
+from app.models.core import Tenant
+from app.models.pricing import FareConfig
+from app.utils.versioned_snapshot import VersionedSnapshot, table_version_sql
+
+# One row per (tenant, vehicle_category) of a city; the rate columns are
+# numpy arrays so a quote prices every row at once
+CityFares = namedtuple(
+    "CityFares",
+    ["tenant_ids", "tenant_names", "vehicle_categories",
+     "base_fare", "per_km", "per_minute", "minimum_fare"]
+)
+
+
+class FareSnapshot:
+    """
+    In-process copy of the fare configuration of ACTIVE tenants, grouped by
+    city. At most every FARE_SNAPSHOT_CHECK_SECONDS a cheap version query
+    runs and the snapshot is reloaded only if fare_config or tenant changed.
+    """
+
+    def __init__(self):
+        self._snapshot = VersionedSnapshot(
+            table_version_sql(FareConfig.__tablename__, Tenant.__tablename__),
+            self._load,
+            FARE_SNAPSHOT_CHECK_SECONDS
+        )
+
+    def for_city(self, db: Session, city_id: int):
+        """The city's ``CityFares``, or None if nothing is priced there"""
+        return self._snapshot.get(db).get(city_id)
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def invalidate(self):
+        """Force a reload on next use, e.g. after changing fares in-process"""
+        self._snapshot.invalidate()
+
+    @staticmethod
+    def _load(db: Session):
+        rows = (
+            db.query(
+                FareConfig.city_id,
+                Tenant.tenant_id,
+                Tenant.name,
+                FareConfig.vehicle_category,
+                FareConfig.base_fare,
+                FareConfig.per_km,
+                FareConfig.per_minute,
+                FareConfig.minimum_fare
+            )
+            .join(Tenant, Tenant.tenant_id == FareConfig.tenant_id)
+            .filter(Tenant.status == "ACTIVE")
+            .order_by(FareConfig.city_id, Tenant.tenant_id, FareConfig.vehicle_category)
+            .all()
+        )
+
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[0], []).append(row[1:])
+
+        by_city = {}
+        for city_id, city_rows in grouped.items():
+            tenant_ids, names, categories, base, per_km, per_minute, minimum = zip(*city_rows)
+            by_city[city_id] = CityFares(
+                tenant_ids=list(tenant_ids),
+                tenant_names=list(names),
+                vehicle_categories=list(categories),
+                base_fare=np.array(base, dtype=np.float64),
+                per_km=np.array(per_km, dtype=np.float64),
+                per_minute=np.array(per_minute, dtype=np.float64),
+                minimum_fare=np.array(minimum, dtype=np.float64)
+            )
+
+        return by_city
+
+
+fare_snapshot = FareSnapshot()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    IDEMPOTENCY_CACHE_SIZE,
+    IDEMPOTENCY_CACHE_TTL_SECONDS,
+    IDEMPOTENCY_KEY_TTL_HOURS
+)
+from app.core.database import SessionLocal
+from app.models.payments import IdempotencyKey
+from app.utils.metrics import counters
+from app.utils.ttl_cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+
+def request_hash(*parts) -> str:
+    return hashlib.sha256(
+        json.dumps(parts, default=str, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    First response per (user, Idempotency-Key).
+
+    ``claim`` inserts the key in the caller's transaction before any work is
+    done and ``record`` stores the response in that same transaction. A
+    concurrent retry blocks on the key's primary key until the first request
+    commits (and then replays its response) or rolls back (and then runs
+    itself), so a key never produces two results. Completed responses are
+    also kept in a TTL cache, so most retries cost no query at all.
+    Keys are kept IDEMPOTENCY_KEY_TTL_HOURS.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL_SECONDS)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _stored(entry, hash_: str):
+        stored_hash, response = entry
+        if stored_hash != hash_:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        counters.inc("idempotency.replayed")
+        return response
+
+    def claim(self, db: Session, user_id: int, key: str, hash_: str):
+        """
+        The stored response if ``key`` was already used, otherwise None
+        after claiming the key for the current transaction.
+        """
+        cached = self._cache.get((user_id, key))
+        if cached is not MISSING:
+            return self._stored(cached, hash_)
+
+        claimed = db.execute(
+            pg_insert(IdempotencyKey)
+            .values(user_id=user_id, idempotency_key=key, request_hash=hash_)
+            .on_conflict_do_nothing()
+            .returning(IdempotencyKey.user_id)
+        ).first()
+        if claimed:
+            return None
+
+        row = (
+            db.query(IdempotencyKey.request_hash, IdempotencyKey.response)
+            .filter(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.idempotency_key == key
+            )
+            .one()
+        )
+        entry = (row.request_hash, row.response)
+        self._cache.set((user_id, key), entry)
+        return self._stored(entry, hash_)
+
+    def record(self, db: Session, user_id: int, key: str, response: dict, status_code: int = 200):
+        """Store the response of a claimed key; the caller commits"""
+        db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.idempotency_key == key
+            )
+            .values(status_code=status_code, response=response)
+        )
+
+    def remember(self, user_id: int, key: str, hash_: str, response: dict):
+        """Cache a recorded response once its transaction has committed"""
+        self._cache.set((user_id, key), (hash_, response))
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="idempotency-purge", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(3600):
+            try:
+                self.purge_expired()
+            except Exception:
+                logger.exception("Purging idempotency keys failed")
+
+    def purge_expired(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+        db = SessionLocal()
+        try:
+            deleted = db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.created_on < cutoff)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        counters.inc("idempotency.purged", deleted)
+
+
+idempotency_store = IdempotencyStore()
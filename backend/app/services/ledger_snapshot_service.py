@@ -0,0 +1,222 @@
+import logging
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import LEDGER_SNAPSHOT_SECONDS
+from app.core.database import SessionLocal
+from app.models.ledger import PlatformLedger, TenantLedger, FleetLedger, LedgerBalanceSnapshot
+from app.models.payments import TenantWallet
+from app.utils.metrics import counters
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = LedgerBalanceSnapshot.__tablename__
+
+# ledger -> (table, owner column); the platform ledger has one owner, 0
+LEDGERS = {
+    "PLATFORM": (PlatformLedger.__tablename__, "0::bigint"),
+    "TENANT": (TenantLedger.__tablename__, "tenant_id"),
+    "FLEET": (FleetLedger.__tablename__, "fleet_id"),
+}
+
+# Only one worker process rolls up at a time
+ROLLUP_LOCK_KEY = 72_002
+
+# Oldest transaction still running; every one before it has finished
+WATERMARK_SQL = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+# Rollup point of a ledger, as a CTE for the read queries
+MARK_CTE = (
+    f"mark AS (SELECT coalesce(max(as_of_xid), 0) AS as_of "
+    f"FROM {SNAPSHOT} WHERE ledger = :ledger)"
+)
+
+
+class LedgerSnapshotService:
+    """
+    Keeps one ledger_balance_snapshot row per (ledger, owner): the sum of
+    the owner's entries written by transactions before ``as_of_xid``. All
+    rows of a ledger share the same ``as_of_xid``, so a balance is the
+    snapshot plus the few entries from later transactions, found through
+    the (owner, txid) index. Reads take the snapshot and those entries in
+    one statement, so a rollup committing meanwhile is never counted twice.
+
+    Every LEDGER_SNAPSHOT_SECONDS the entries since the last rollup are
+    aggregated per owner and added to the snapshots in one statement per
+    ledger. A rollup only goes up to the oldest transaction still running
+    (pg_snapshot_xmin): an entry id or timestamp is handed out before
+    commit, but a transaction id below that point can no longer add
+    entries, so none is ever skipped however late it commits.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="ledger-snapshots", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(LEDGER_SNAPSHOT_SECONDS):
+            try:
+                self.rollup()
+            except Exception:
+                logger.exception("Ledger snapshot rollup failed")
+
+    # ---- rollup ----------------------------------------------------
+
+    @staticmethod
+    def _as_of(db: Session, ledger: str) -> int:
+        return db.execute(
+            text(f"SELECT coalesce(max(as_of_xid), 0) FROM {SNAPSHOT} WHERE ledger = :ledger"),
+            {"ledger": ledger}
+        ).scalar()
+
+    def rollup(self):
+        db = SessionLocal()
+        try:
+            if not db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY}
+            ).scalar():
+                return
+
+            watermark = db.execute(text(f"SELECT {WATERMARK_SQL}")).scalar()
+            for ledger in LEDGERS:
+                self._rollup_ledger(db, ledger, watermark)
+            db.commit()
+        finally:
+            db.close()
+
+    def _rollup_ledger(self, db: Session, ledger: str, watermark: int):
+        table, owner = LEDGERS[ledger]
+        as_of = self._as_of(db, ledger)
+        if watermark <= as_of:
+            return
+
+        params = {"ledger": ledger, "as_of": as_of, "upto": watermark}
+        added = db.execute(
+            text(f"""
+                INSERT INTO {SNAPSHOT} (ledger, owner_id, as_of_xid, balance, entry_count)
+                SELECT :ledger, {owner}, :upto, sum(amount), count(*)
+                FROM {table}
+                WHERE txid >= :as_of AND txid < :upto
+                GROUP BY 2
+                ON CONFLICT (ledger, owner_id) DO UPDATE SET
+                    balance = {SNAPSHOT}.balance + excluded.balance,
+                    entry_count = {SNAPSHOT}.entry_count + excluded.entry_count,
+                    as_of_xid = excluded.as_of_xid,
+                    updated_on = now()
+            """),
+            params
+        ).rowcount
+        db.execute(
+            text(f"UPDATE {SNAPSHOT} SET as_of_xid = :upto WHERE ledger = :ledger"),
+            params
+        )
+        counters.inc(f"ledger_snapshot.{ledger.lower()}_owners_updated", added)
+
+    # ---- reads -----------------------------------------------------
+
+    @staticmethod
+    def _balance_sql(ledger: str) -> str:
+        """Balance of :owner_id as a scalar expression; needs ``MARK_CTE``"""
+        table, owner = LEDGERS[ledger]
+        return f"""
+            coalesce(
+                (SELECT balance FROM {SNAPSHOT} WHERE ledger = :ledger AND owner_id = :owner_id), 0
+            ) + coalesce(
+                (SELECT sum(amount) FROM {table}
+                 WHERE {owner} = :owner_id AND txid >= (SELECT as_of FROM mark)), 0
+            )
+        """
+
+    def balance(self, db: Session, ledger: str, owner_id: int):
+        """Current ledger balance of one owner (0 for the platform)"""
+        return db.execute(
+            text(f"WITH {MARK_CTE} SELECT {self._balance_sql(ledger)}"),
+            {"ledger": ledger, "owner_id": owner_id}
+        ).scalar()
+
+    def balances(self, db: Session, ledger: str) -> dict:
+        """Current ledger balance of every owner, {owner_id: balance}"""
+        table, owner = LEDGERS[ledger]
+        rows = db.execute(
+            text(f"""
+                WITH {MARK_CTE},
+                tail AS (
+                    SELECT {owner} AS owner_id, sum(amount) AS amount
+                    FROM {table}
+                    WHERE txid >= (SELECT as_of FROM mark)
+                    GROUP BY 1
+                ),
+                snap AS (
+                    SELECT owner_id, balance FROM {SNAPSHOT} WHERE ledger = :ledger
+                )
+                SELECT coalesce(snap.owner_id, tail.owner_id),
+                       coalesce(snap.balance, 0) + coalesce(tail.amount, 0)
+                FROM snap FULL JOIN tail ON tail.owner_id = snap.owner_id
+            """),
+            {"ledger": ledger}
+        ).all()
+        return dict(rows)
+
+    def statement(self, db: Session, ledger: str, owner_id: int, limit: int = 50):
+        """Latest entries of one owner with the balance after each, newest first"""
+        table, owner = LEDGERS[ledger]
+        # The balance comes from the same statement, so it includes exactly
+        # the entries listed
+        entries = db.execute(
+            text(f"""
+                WITH {MARK_CTE}
+                SELECT entry_id, trip_id, amount, entry_type, created_on,
+                       {self._balance_sql(ledger)} AS balance
+                FROM {table}
+                WHERE {owner} = :owner_id
+                ORDER BY entry_id DESC
+                LIMIT :limit
+            """),
+            {"ledger": ledger, "owner_id": owner_id, "limit": limit}
+        ).all()
+
+        running = entries[0].balance if entries else None
+        lines = []
+        for entry in entries:
+            lines.append({
+                "entry_id": entry.entry_id,
+                "trip_id": entry.trip_id,
+                "amount": entry.amount,
+                "entry_type": entry.entry_type,
+                "created_on": entry.created_on,
+                "balance": running
+            })
+            running -= entry.amount
+        return lines
+
+    def reconcile_tenants(self, db: Session):
+        """``(tenant_id, wallet_balance, ledger_balance)`` of every tenant whose wallet disagrees with its ledger"""
+        ledger = self.balances(db, "TENANT")
+        wallets = dict(db.query(TenantWallet.tenant_id, TenantWallet.balance).all())
+
+        return [
+            (tenant_id, wallets.get(tenant_id, 0), ledger.get(tenant_id, 0))
+            for tenant_id in sorted(ledger.keys() | wallets.keys())
+            if wallets.get(tenant_id, 0) != ledger.get(tenant_id, 0)
+        ]
+
+
+ledger_snapshots = LedgerSnapshotService()
@@ -0,0 +1,149 @@
+import logging
+import threading
+from collections import namedtuple
+
+from sqlalchemy import update, values, column, BigInteger, TIMESTAMP
+
+from app.core.config import (
+    LOCATION_MIN_DISTANCE_METERS,
+    LOCATION_MIN_INTERVAL_SECONDS,
+    LOCATION_HEARTBEAT_FLUSH_SECONDS,
+    LOCATION_FILTER_MAX_DRIVERS
+)
+from app.core.database import SessionLocal
+from app.models.operations import DriverLocation
+from app.utils.dispatch_attempt import haversine
+from app.utils.metrics import counters
+from app.utils.ttl_cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+Fix = namedtuple("Fix", ["latitude", "longitude", "recorded_at"])
+
+
+class LocationFixFilter:
+    """
+    Drops fixes that moved less than LOCATION_MIN_DISTANCE_METERS within
+    LOCATION_MIN_INTERVAL_SECONDS of the last fix written for the driver, so
+    a parked car costs one write per interval instead of one per ping.
+
+    A dropped fix still counts as a sign of life: its time is kept as a
+    heartbeat and every LOCATION_HEARTBEAT_FLUSH_SECONDS all pending
+    heartbeats move driver_location.last_updated in a single UPDATE.
+
+    The last written fix is kept per process, so a driver whose pings
+    alternate between workers is simply filtered less.
+    """
+
+    def __init__(self):
+        # Entries expire with the interval: no entry means "write it"
+        self._last = TTLCache(
+            max_entries=LOCATION_FILTER_MAX_DRIVERS,
+            ttl_seconds=LOCATION_MIN_INTERVAL_SECONDS
+        )
+        self._heartbeats = {}   # driver_id -> latest dropped recorded_at
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _is_new(prev: Fix, fix: Fix) -> bool:
+        elapsed = (fix.recorded_at - prev.recorded_at).total_seconds()
+        if elapsed >= LOCATION_MIN_INTERVAL_SECONDS:
+            return True
+        moved_m = haversine(
+            float(prev.latitude), float(prev.longitude),
+            float(fix.latitude), float(fix.longitude)
+        ) * 1000
+        return moved_m >= LOCATION_MIN_DISTANCE_METERS
+
+    def thin(self, driver_id: int, fixes):
+        """
+        Return the time-ordered ``fixes`` that should be written. Fixes older
+        than the last written one (an offline backlog) are thinned against
+        each other only.
+        """
+        last = self._last.get(driver_id)
+        prev = None if last is MISSING or last.recorded_at > fixes[0].recorded_at else last
+
+        admitted = []
+        dropped_at = None
+        for fix in fixes:
+            if prev is None or self._is_new(prev, fix):
+                admitted.append(fix)
+                prev = fix
+            else:
+                dropped_at = fix.recorded_at
+
+        if admitted and (last is MISSING or admitted[-1].recorded_at > last.recorded_at):
+            self._last.set(driver_id, admitted[-1])
+
+        dropped = len(fixes) - len(admitted)
+        if dropped:
+            counters.inc("location_fix.dropped", dropped)
+            with self._lock:
+                if self._heartbeats.get(driver_id, dropped_at) <= dropped_at:
+                    self._heartbeats[driver_id] = dropped_at
+        counters.inc("location_fix.accepted", len(admitted))
+
+        return admitted
+
+    def forget(self, driver_id: int):
+        """The next fix of this driver is written whatever it is"""
+        self._last.invalidate(driver_id)
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="location-heartbeat-flush", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush_heartbeats()
+
+    def _run(self):
+        while not self._stop.wait(LOCATION_HEARTBEAT_FLUSH_SECONDS):
+            self.flush_heartbeats()
+
+    def flush_heartbeats(self):
+        with self._lock:
+            pending, self._heartbeats = self._heartbeats, {}
+
+        if not pending:
+            return
+
+        beats = values(
+            column("driver_id", BigInteger),
+            column("recorded_at", TIMESTAMP(timezone=True)),
+            name="beats"
+        ).data(list(pending.items()))
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(DriverLocation)
+                .where(
+                    DriverLocation.driver_id == beats.c.driver_id,
+                    DriverLocation.last_updated < beats.c.recorded_at
+                )
+                .values(last_updated=beats.c.recorded_at)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Writing %s location heartbeats failed", len(pending))
+            return
+        finally:
+            db.close()
+
+        counters.inc("location_fix.heartbeats_written", len(pending))
+
+
+location_fix_filter = LocationFixFilter()
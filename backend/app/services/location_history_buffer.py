@@ -0,0 +1,154 @@
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    LOCATION_HISTORY_WRITE_MODE,
+    LOCATION_HISTORY_FLUSH_ROWS,
+    LOCATION_HISTORY_FLUSH_SECONDS,
+    LOCATION_HISTORY_MAX_ROWS
+)
+from app.core.database import SessionLocal
+from app.models.operations import DriverLocationHistory
+from app.utils.bulk import copy_rows
+from app.utils.metrics import counters
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = ("driver_id", "latitude", "longitude", "recorded_at")
+
+# Session.info key of the rows recorded in the session's open transaction
+PENDING_KEY = "location_history_pending"
+
+
+class LocationHistoryBuffer:
+    """
+    Write-behind buffer for driver_location_history.
+
+    Rows are ``(driver_id, latitude, longitude, recorded_at)`` tuples. In
+    BUFFERED mode they are kept in memory and COPYed in bulk once
+    LOCATION_HISTORY_FLUSH_ROWS are waiting or every
+    LOCATION_HISTORY_FLUSH_SECONDS, and on shutdown. Rows only reach the
+    buffer once the recording session commits; a rolled-back request adds
+    nothing. Memory is capped at LOCATION_HISTORY_MAX_ROWS: when the buffer
+    is full the flusher is woken and the oldest rows are dropped and
+    counted, so callers never wait on the database. A hard crash loses at
+    most one flush interval; SYNC mode writes the rows in the request's own
+    transaction instead.
+    """
+
+    def __init__(
+        self,
+        mode: str = LOCATION_HISTORY_WRITE_MODE,
+        flush_rows: int = LOCATION_HISTORY_FLUSH_ROWS,
+        flush_seconds: float = LOCATION_HISTORY_FLUSH_SECONDS,
+        max_rows: int = LOCATION_HISTORY_MAX_ROWS
+    ):
+        self.mode = mode
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_rows = max_rows
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, db: Session, rows):
+        if self.mode == "SYNC":
+            copy_rows(db, DriverLocationHistory.__tablename__, HISTORY_COLUMNS, rows)
+            return
+
+        # Tie the rows to an open transaction so its rollback discards them
+        if not db.in_transaction():
+            db.begin()
+        db.info.setdefault(PENDING_KEY, []).extend(rows)
+
+    def _append(self, rows):
+        with self._lock:
+            self._rows.extend(rows)
+            size = len(self._rows)
+            overflow = size - self.max_rows
+            if overflow > 0:
+                del self._rows[:overflow]
+
+        if overflow > 0:
+            counters.inc("location_history.rows_dropped", overflow)
+        if size >= self.flush_rows:
+            self._wake.set()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def start(self):
+        if self._thread or self.mode == "SYNC":
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="location-history-flush", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        # One flusher at a time keeps rows in order and the DB load bounded
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+
+            if not rows:
+                return
+
+            db = SessionLocal()
+            try:
+                copy_rows(db, DriverLocationHistory.__tablename__, HISTORY_COLUMNS, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Flushing %s location history rows failed", len(rows))
+                self._requeue(rows)
+                return
+            finally:
+                db.close()
+
+            counters.inc("location_history.flushes")
+            counters.inc("location_history.rows_written", len(rows))
+
+    def _requeue(self, rows):
+        with self._lock:
+            self._rows = rows + self._rows
+            overflow = len(self._rows) - self.max_rows
+            if overflow > 0:
+                del self._rows[:overflow]
+                counters.inc("location_history.rows_dropped", overflow)
+
+
+location_history_buffer = LocationHistoryBuffer()
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed(session):
+    rows = session.info.pop(PENDING_KEY, None)
+    if rows:
+        location_history_buffer._append(rows)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,423 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    LOCATION_HISTORY_PARTITION,
+    LOCATION_HISTORY_PARTITIONS_AHEAD_DAYS,
+    LOCATION_HISTORY_RETENTION_DAYS,
+    LOCATION_HISTORY_COMPACT_AFTER_DAYS,
+    LOCATION_HISTORY_SIMPLIFY_METERS,
+    LOCATION_HISTORY_SEGMENT_GAP_SECONDS,
+    LOCATION_HISTORY_MAINTENANCE_SECONDS
+)
+from app.core.database import SessionLocal
+from app.models.operations import DriverLocationHistory, DriverLocationHistoryPartition
+from app.utils.bulk import copy_rows
+from app.utils.metrics import counters
+from app.utils.trajectory import simplify_track
+
+logger = logging.getLogger(__name__)
+
+PARENT = DriverLocationHistory.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+COLUMNS = ("id", "driver_id", "latitude", "longitude", "recorded_at")
+
+# Only one worker process runs maintenance at a time
+MAINTENANCE_LOCK_KEY = 72_001
+
+COMPACT_READ_ROWS = 10000
+COMPACT_WRITE_ROWS = 10000
+# Compaction gives up for this round rather than queue writers behind it
+COMPACT_LOCK_TIMEOUT = "5s"
+
+
+def period_start(ts: datetime) -> datetime:
+    start = ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if LOCATION_HISTORY_PARTITION == "WEEK":
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def period_end(ts: datetime) -> datetime:
+    days = 7 if LOCATION_HISTORY_PARTITION == "WEEK" else 1
+    return period_start(ts) + timedelta(days=days)
+
+
+def _literal(ts: datetime) -> str:
+    return f"'{ts.astimezone(timezone.utc).isoformat()}'"
+
+
+class LocationHistoryMaintenance:
+    """
+    Keeps the range-partitioned driver_location_history healthy:
+
+    - creates partitions LOCATION_HISTORY_PARTITIONS_AHEAD_DAYS ahead, moving
+      any rows that fell into the default partition while one was missing;
+    - drops partitions past LOCATION_HISTORY_RETENTION_DAYS;
+    - compacts partitions past LOCATION_HISTORY_COMPACT_AFTER_DAYS once, by
+      Douglas-Peucker simplification of every driver's track, rewriting the
+      partition rather than deleting rows so nothing is left to vacuum. The
+      rewrite reads a snapshot without blocking inserts; the partition is
+      locked only to swap the rewritten table in.
+
+    Partitions are tracked in driver_location_history_partition. If the
+    table has not been migrated to a partitioned one, maintenance is
+    disabled with a warning instead of failing startup.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+        self._disabled = False
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="location-history-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(LOCATION_HISTORY_MAINTENANCE_SECONDS):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Location history maintenance failed")
+
+    def run_once(self):
+        if self._disabled:
+            return
+        self.ensure_partitions()
+        self.drop_expired()
+        self.compact()
+
+    @staticmethod
+    def _try_lock(db: Session) -> bool:
+        return db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {"key": MAINTENANCE_LOCK_KEY}
+        ).scalar()
+
+    @staticmethod
+    def _is_partitioned(db: Session) -> bool:
+        return db.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                "WHERE partrelid = to_regclass(:name))"
+            ),
+            {"name": PARENT}
+        ).scalar()
+
+    def ensure_partitions(self):
+        db = SessionLocal()
+        try:
+            if not self._is_partitioned(db):
+                logger.warning(
+                    "%s is not partitioned; apply the partitioning migration in "
+                    "RideSharing.sql and restart. Location history maintenance is off",
+                    PARENT
+                )
+                self._disabled = True
+                return
+
+            if not self._try_lock(db):
+                return
+
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} "
+                f"PARTITION OF {PARENT} DEFAULT"
+            ))
+
+            now = datetime.now(timezone.utc)
+            latest_end = (
+                db.query(DriverLocationHistoryPartition.range_end)
+                .order_by(DriverLocationHistoryPartition.range_end.desc())
+                .limit(1)
+                .scalar()
+            )
+
+            oldest_kept = period_start(now - timedelta(days=LOCATION_HISTORY_RETENTION_DAYS))
+            start = max(latest_end, oldest_kept) if latest_end else period_start(now)
+            horizon = now + timedelta(days=LOCATION_HISTORY_PARTITIONS_AHEAD_DAYS)
+
+            while start < horizon:
+                end = period_end(start)
+                self._create_partition(db, start, end)
+                start = end
+
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _create_partition(db: Session, start: datetime, end: datetime):
+        name = f"{PARENT}_p{start:%Y%m%d}"
+        columns = ", ".join(COLUMNS)
+
+        # Build the table standalone and attach it, so rows that landed in
+        # the default partition for this range move across instead of
+        # making the attach fail
+        db.execute(text(
+            f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        db.execute(text(
+            f"WITH moved AS ("
+            f"  DELETE FROM {DEFAULT_PARTITION}"
+            f"  WHERE recorded_at >= {_literal(start)} AND recorded_at < {_literal(end)}"
+            f"  RETURNING {columns}"
+            f") INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+        ))
+        db.execute(text(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})"
+        ))
+
+        db.add(DriverLocationHistoryPartition(
+            partition_name=name,
+            range_start=start,
+            range_end=end
+        ))
+        counters.inc("location_history.partitions_created")
+
+    def drop_expired(self):
+        db = SessionLocal()
+        try:
+            if not self._try_lock(db):
+                return
+
+            cutoff = datetime.now(timezone.utc) - timedelta(days=LOCATION_HISTORY_RETENTION_DAYS)
+
+            expired = (
+                db.query(DriverLocationHistoryPartition)
+                .filter(DriverLocationHistoryPartition.range_end <= cutoff)
+                .all()
+            )
+
+            for partition in expired:
+                db.execute(text(f"DROP TABLE IF EXISTS {partition.partition_name}"))
+                db.delete(partition)
+
+            db.execute(
+                text(f"DELETE FROM {DEFAULT_PARTITION} WHERE recorded_at < :cutoff"),
+                {"cutoff": cutoff}
+            )
+
+            db.commit()
+            counters.inc("location_history.partitions_dropped", len(expired))
+        finally:
+            db.close()
+
+    def compact(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=LOCATION_HISTORY_COMPACT_AFTER_DAYS)
+
+        db = SessionLocal()
+        try:
+            pending = [
+                name for (name,) in (
+                    db.query(DriverLocationHistoryPartition.partition_name)
+                    .filter(
+                        DriverLocationHistoryPartition.range_end <= cutoff,
+                        DriverLocationHistoryPartition.compacted_at.is_(None)
+                    )
+                    .order_by(DriverLocationHistoryPartition.range_start)
+                    .all()
+                )
+            ]
+        finally:
+            db.close()
+
+        for name in pending:
+            if self._stop.is_set():
+                return
+            self._compact_partition(name)
+
+    def _compact_partition(self, name: str):
+        # The slow part runs without blocking writers; only the swap locks
+        if self._build_compacted(name):
+            self._swap_compacted(name)
+
+    @staticmethod
+    def _build_snapshot(db: Session, rewritten: str):
+        """Snapshot a finished build of ``rewritten`` was read under, or None"""
+        return db.execute(
+            text("SELECT obj_description(to_regclass(:name), 'pg_class')"),
+            {"name": rewritten}
+        ).scalar()
+
+    def _build_compacted(self, name: str) -> bool:
+        """
+        Writes the simplified partition to {name}_c from a single snapshot,
+        recorded as the table's comment. Inserts carry on meanwhile; rows the
+        snapshot did not see are copied across by the swap.
+        """
+        db = SessionLocal()
+        try:
+            # One snapshot for the whole read and for the one recorded
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+            if not self._try_lock(db):
+                return False
+
+            partition = db.get(DriverLocationHistoryPartition, name)
+            if not partition or partition.compacted_at:
+                return False
+
+            rewritten = f"{name}_c"
+            columns = ", ".join(COLUMNS)
+
+            # A build whose swap could not get its locks is still good
+            if self._build_snapshot(db, rewritten) is not None:
+                return True
+            db.execute(text(f"DROP TABLE IF EXISTS {rewritten}"))
+
+            snapshot = db.execute(text("SELECT txid_current_snapshot()::text")).scalar()
+
+            db.execute(text(
+                f"CREATE TABLE {rewritten} (LIKE {PARENT} "
+                f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES)"
+            ))
+            # Lets ATTACH skip scanning the table while it holds its locks
+            db.execute(text(
+                f"ALTER TABLE {rewritten} ADD CONSTRAINT {rewritten}_range CHECK ("
+                f"recorded_at >= {_literal(partition.range_start)} "
+                f"AND recorded_at < {_literal(partition.range_end)})"
+            ))
+
+            rows = db.execute(
+                text(f"SELECT {columns} FROM {name} ORDER BY driver_id, recorded_at")
+                .execution_options(yield_per=COMPACT_READ_ROWS)
+            )
+
+            read = kept = 0
+            track, out = [], []
+
+            for row in rows:
+                read += 1
+                if track and track[-1][1] != row[1]:
+                    kept += self._simplify_into(track, out)
+                    track = []
+                track.append(tuple(row))
+
+                if len(out) >= COMPACT_WRITE_ROWS:
+                    copy_rows(db, rewritten, COLUMNS, out)
+                    out = []
+
+            if track:
+                kept += self._simplify_into(track, out)
+            if out:
+                copy_rows(db, rewritten, COLUMNS, out)
+
+            # txid_current_snapshot() text is digits, colons and commas only
+            db.execute(text(f"COMMENT ON TABLE {rewritten} IS '{snapshot}'"))
+            db.commit()
+
+            counters.inc("location_history.compact_rows_read", read)
+            counters.inc("location_history.compact_rows_kept", kept)
+            logger.info("Simplified %s: kept %s of %s rows", name, kept, read)
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _swap_compacted(self, name: str):
+        """Replaces the partition with its build, adding rows written since"""
+        db = SessionLocal()
+        try:
+            if not self._try_lock(db):
+                return
+
+            partition = db.get(DriverLocationHistoryPartition, name)
+            if not partition or partition.compacted_at:
+                return
+
+            rewritten = f"{name}_c"
+            columns = ", ".join(COLUMNS)
+
+            snapshot = self._build_snapshot(db, rewritten)
+            if snapshot is None:
+                return
+
+            # Assigns this transaction's id, which age(xmin) below counts from
+            db.execute(text("SELECT txid_current()"))
+
+            # DETACH needs ACCESS EXCLUSIVE on the parent and the partition.
+            # Take both up front, parent first as inserts do: upgrading a
+            # weaker lock later can deadlock with a concurrent insert.
+            # Late fixes for this range wait only for the swap below.
+            db.execute(text(f"SET LOCAL lock_timeout = '{COMPACT_LOCK_TIMEOUT}'"))
+            try:
+                db.execute(text(f"LOCK TABLE ONLY {PARENT} IN ACCESS EXCLUSIVE MODE"))
+                db.execute(text(f"LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE"))
+            except OperationalError:
+                db.rollback()
+                counters.inc("location_history.compact_lock_timeouts")
+                logger.info("Compaction of %s deferred: tables busy", name)
+                return
+            db.execute(text("SET LOCAL lock_timeout = 0"))
+
+            # Rows committed after the build's snapshot, kept unsimplified;
+            # every writer has finished, the locks waited for them
+            late = db.execute(
+                text(
+                    f"INSERT INTO {rewritten} ({columns}) "
+                    f"SELECT {columns} FROM {name} "
+                    f"WHERE NOT txid_visible_in_snapshot("
+                    f"txid_current() - age(xmin), CAST(:snapshot AS txid_snapshot))"
+                ),
+                {"snapshot": snapshot}
+            ).rowcount
+
+            db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            db.execute(text(f"ALTER TABLE {rewritten} RENAME TO {name}"))
+            db.execute(text(
+                f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ({_literal(partition.range_start)}) "
+                f"TO ({_literal(partition.range_end)})"
+            ))
+            db.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {rewritten}_range"))
+            db.execute(text(f"COMMENT ON TABLE {name} IS NULL"))
+
+            partition.compacted_at = datetime.now(timezone.utc)
+            db.commit()
+
+            counters.inc("location_history.partitions_compacted")
+            counters.inc("location_history.compact_rows_late", late)
+            logger.info("Compacted %s: %s rows arrived during the rewrite", name, late)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _simplify_into(track, out) -> int:
+        keep = simplify_track(
+            [float(row[2]) for row in track],
+            [float(row[3]) for row in track],
+            [row[4].timestamp() for row in track],
+            LOCATION_HISTORY_SIMPLIFY_METERS,
+            LOCATION_HISTORY_SEGMENT_GAP_SECONDS
+        )
+        kept = [row for row, k in zip(track, keep) if k]
+        out.extend(kept)
+        return len(kept)
+
+
+location_history_maintenance = LocationHistoryMaintenance()
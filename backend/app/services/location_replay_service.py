@@ -0,0 +1,126 @@
+import json
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.fleet import DriverProfile
+from app.models.identity import AppUser
+from app.models.operations import DriverLocationHistory
+from app.models.tenant import TenantAdmin
+from app.models.trips import Trip
+from app.utils.location_frame import encode_frames
+from app.utils.route_codec import to_epoch_ms
+
+REPLAY_FETCH_ROWS = 2000
+OPS_ROLES = ("PLATFORM_ADMIN", "SUPPORT_AGENT")
+
+
+class LocationReplayService:
+
+    @staticmethod
+    def authorize_driver(db: Session, user: AppUser, driver_id: int):
+        """Platform ops see every driver, tenant admins their own drivers, drivers themselves"""
+        if user.role in OPS_ROLES:
+            return
+        if user.role == "DRIVER" and user.user_id == driver_id:
+            return
+
+        if user.role == "TENANT_ADMIN":
+            own_driver = (
+                db.query(DriverProfile.driver_id)
+                .join(TenantAdmin, TenantAdmin.tenant_id == DriverProfile.tenant_id)
+                .filter(
+                    TenantAdmin.user_id == user.user_id,
+                    DriverProfile.driver_id == driver_id
+                )
+                .first()
+            )
+            if own_driver:
+                return
+
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to view this driver's locations"
+        )
+
+    @staticmethod
+    def trip_window(db: Session, user: AppUser, trip_id: int):
+        """``(driver_id, start, end)`` of a trip, from assignment to completion"""
+        trip = db.query(Trip).filter(Trip.trip_id == trip_id).first()
+
+        if not trip:
+            raise HTTPException(status_code=404, detail="Trip not found")
+
+        if not trip.driver_id or not trip.assigned_at:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Trip was never assigned to a driver"
+            )
+
+        LocationReplayService.authorize_driver(db, user, trip.driver_id)
+
+        end = trip.completed_at or trip.cancelled_at or datetime.now(timezone.utc)
+        return trip.driver_id, trip.assigned_at, end
+
+    @staticmethod
+    def validate_range(start: datetime, end: datetime):
+        start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+        end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+
+        if start >= end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start must be before end"
+            )
+        return start, end
+
+    @staticmethod
+    def stream(driver_id: int, start: datetime, end: datetime, fmt: str = "ndjson"):
+        """
+        Yield the driver's history between ``start`` and ``end`` in time
+        order, as NDJSON lines or location frames (app.utils.location_frame).
+
+        Rows come from a server-side cursor REPLAY_FETCH_ROWS at a time, so
+        memory stays flat and the first chunk goes out after the first
+        fetch. The generator owns its session because it outlives the
+        request's.
+        """
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(
+                    DriverLocationHistory.latitude,
+                    DriverLocationHistory.longitude,
+                    DriverLocationHistory.recorded_at
+                )
+                .where(
+                    DriverLocationHistory.driver_id == driver_id,
+                    DriverLocationHistory.recorded_at >= start,
+                    DriverLocationHistory.recorded_at < end
+                )
+                .order_by(DriverLocationHistory.recorded_at)
+                .execution_options(yield_per=REPLAY_FETCH_ROWS)
+            )
+
+            for batch in rows.partitions():
+                if fmt == "binary":
+                    yield encode_frames(
+                        driver_id,
+                        [to_epoch_ms(ts) for _, _, ts in batch],
+                        [float(lat) for lat, _, _ in batch],
+                        [float(lng) for _, lng, _ in batch]
+                    )
+                else:
+                    yield "".join(
+                        json.dumps({
+                            "latitude": float(lat),
+                            "longitude": float(lng),
+                            "recorded_at": ts.isoformat()
+                        }) + "\n"
+                        for lat, lng, ts in batch
+                    )
+        finally:
+            db.close()
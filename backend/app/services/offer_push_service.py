@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy import text
+
+from app.core.config import OFFER_PUSH_QUEUE_SIZE, OFFER_PUSH_LISTEN
+from app.core.database import engine
+from app.utils.metrics import counters
+
+logger = logging.getLogger(__name__)
+
+# Every worker LISTENs and delivers to its own connections
+PUSH_CHANNEL = "trip_offer_push"
+# NOTIFY payloads must be shorter than 8000 bytes
+PUSH_PAYLOAD_BYTES = 7900
+
+# Queued in place of a connection's backlog when it overflows: the
+# connection is sent a fresh snapshot instead
+RESYNC = {"type": "resync"}
+
+
+def offer_payload(trip):
+    """Same shape as the items of GET /drivers/trips/offers"""
+    return {
+        "trip_id": trip.trip_id,
+        "pickup_lat": float(trip.pickup_lat),
+        "pickup_lng": float(trip.pickup_lng),
+        "drop_lat": float(trip.drop_lat) if trip.drop_lat is not None else None,
+        "drop_lng": float(trip.drop_lng) if trip.drop_lng is not None else None
+    }
+
+
+def push_payloads(driver_ids, message):
+    """NOTIFY payloads for ``message``, splitting ``driver_ids`` to fit each under the limit"""
+    def encode(ids):
+        return json.dumps({"driver_ids": ids, "message": message}, separators=(",", ":"))
+
+    base = len(encode([]).encode())
+    payloads, chunk, size = [], [], base
+    for driver_id in driver_ids:
+        width = len(str(driver_id)) + 1
+        if chunk and size + width > PUSH_PAYLOAD_BYTES:
+            payloads.append(encode(chunk))
+            chunk, size = [], base
+        chunk.append(driver_id)
+        size += width
+    if chunk:
+        payloads.append(encode(chunk))
+    return payloads
+
+
+class OfferHub:
+    """
+    Pushes trip offers and revocations to connected drivers.
+
+    Connections live on the event loop of the worker the driver connected
+    to. With OFFER_PUSH_LISTEN messages are published on PUSH_CHANNEL and
+    every worker's listener thread hands them to its own connections with
+    ``call_soon_threadsafe``, so a trip dispatched on one worker reaches
+    drivers connected to another. Each connection has a bounded queue so
+    one slow driver can't hold up the rest; if it overflows its backlog is
+    dropped and the driver is sent a fresh snapshot instead. Every
+    connection is resynced the same way after each (re)LISTEN, since
+    messages may have been missed while not listening.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._connections = {}  # driver_id -> {asyncio.Queue}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def offer(self, driver_ids, trip):
+        self._publish(driver_ids, {"type": "offer", "offer": offer_payload(trip)})
+
+    def revoke(self, driver_ids, trip_id: int):
+        self._publish(driver_ids, {"type": "revoked", "trip_id": trip_id})
+
+    def _publish(self, driver_ids, message):
+        driver_ids = list(driver_ids)
+        if not driver_ids:
+            return
+
+        if OFFER_PUSH_LISTEN:
+            try:
+                with engine.connect() as connection:
+                    for payload in push_payloads(driver_ids, message):
+                        connection.execute(
+                            text("SELECT pg_notify(:channel, :payload)"),
+                            {"channel": PUSH_CHANNEL, "payload": payload}
+                        )
+                    connection.commit()
+                return
+            except Exception:
+                # Drivers connected here can still be reached
+                logger.exception("Publishing offer push failed")
+                counters.inc("offer_push.publish_failures")
+
+        self._call_in_loop(self._fan_out, driver_ids, message)
+
+    def _call_in_loop(self, callback, *args):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(callback, *args)
+
+    def _fan_out(self, driver_ids, message):
+        for driver_id in driver_ids:
+            for queue in self._connections.get(driver_id, ()):
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    counters.inc("offer_push.dropped")
+                    self._resync(queue)
+
+    @staticmethod
+    def _resync(queue: asyncio.Queue):
+        # The snapshot supersedes everything queued before it
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+    def _resync_all(self):
+        for queues in self._connections.values():
+            for queue in queues:
+                self._resync(queue)
+
+    # ---- cross-worker delivery -------------------------------------
+
+    def start(self):
+        if self._thread or not OFFER_PUSH_LISTEN:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="offer-push-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Offer push listener failed")
+            self._stop.wait(5)
+
+    def _listen(self):
+        connection = engine.raw_connection()
+        try:
+            dbapi = connection.dbapi_connection
+            dbapi.autocommit = True
+            cursor = dbapi.cursor()
+            cursor.execute(f"LISTEN {PUSH_CHANNEL}")
+            cursor.close()
+
+            # Anything may have been published while we were not listening
+            self._call_in_loop(self._resync_all)
+
+            while not self._stop.is_set():
+                if select.select([dbapi], [], [], 1.0)[0]:
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        push = json.loads(dbapi.notifies.pop(0).payload)
+                        self._call_in_loop(self._fan_out, push["driver_ids"], push["message"])
+        finally:
+            connection.invalidate()
+
+    async def serve(self, websocket: WebSocket, driver_id: int, load_offers):
+        """
+        Send the current offers, then stream changes until disconnect.
+
+        ``load_offers`` is awaited only after the connection's queue is
+        registered: anything published meanwhile is sent right after the
+        snapshot (an offer may then arrive twice; clients key on trip_id).
+        The same holds for the snapshots sent when the queue overflows.
+        """
+        queue = asyncio.Queue(maxsize=OFFER_PUSH_QUEUE_SIZE)
+        self._connections.setdefault(driver_id, set()).add(queue)
+
+        # Clients don't send anything; reading just notices the disconnect
+        async def drain():
+            try:
+                while True:
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                pass
+
+        async def send_snapshot():
+            offers = await load_offers()
+            await websocket.send_json({"type": "snapshot", "offers": offers})
+
+        receiver = None
+        try:
+            receiver = asyncio.create_task(drain())
+            await send_snapshot()
+
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, receiver},
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                    break
+
+                message = getter.result()
+                if message is RESYNC:
+                    await send_snapshot()
+                else:
+                    await websocket.send_json(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if receiver is not None:
+                receiver.cancel()
+            queues = self._connections.get(driver_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._connections[driver_id]
+
+
+offer_hub = OfferHub()
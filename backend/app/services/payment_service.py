@@ -1,10 +1,12 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
 from datetime import datetime, timezone
 
 from app.models.trips import Trip
 from app.models.payments import Payment
-from app.services.settlement_service import settle_payment
+from app.services.idempotency_service import idempotency_store, request_hash
+from app.services.settlement_service import PAYMENT_MODES
 
 class PaymentService:
 
@@ -14,9 +16,22 @@ class PaymentService:
         trip_id: int,
         rider_id: int,
         payment_mode: str,
-        amount: float
+        amount: float,
+        idempotency_key: str = None
     ):
-        # 1. Validate trip
+        """
+        Record a payment and return its fields, JSON-encoded. With an
+        ``idempotency_key``, a repeated request gets the first response back
+        without touching the trip again.
+        """
+        # 0. Replay a retried request
+        if idempotency_key:
+            hash_ = request_hash(trip_id, payment_mode, amount)
+            stored = idempotency_store.claim(db, rider_id, idempotency_key, hash_)
+            if stored is not None:
+                return stored
+
+        # 1. Validate trip; the row lock makes concurrent payments wait here
         trip = (
             db.query(Trip)
             .filter(
@@ -24,6 +39,7 @@ class PaymentService:
                 Trip.rider_id == rider_id,
                 Trip.status == "COMPLETED"
             )
+            .with_for_update()
             .first()
         )
 
@@ -33,6 +49,10 @@ class PaymentService:
         if trip.payment_status == "SUCCESS":
             raise HTTPException(400, "Payment already done")
 
+        # Settlement runs later, so reject what it could not settle now
+        if payment_mode not in PAYMENT_MODES:
+            raise HTTPException(400, "Invalid payment mode")
+
         # 2. Create payment record
         payment = Payment(
             trip_id=trip.trip_id,
@@ -48,15 +68,20 @@ class PaymentService:
         # 3. Update trip payment status
         trip.payment_status = "SUCCESS"
 
-        # 4. Settlement (THIS IS THE CORE)
-        settle_payment(
-            db=db,
-            trip=trip,
-            amount=amount,
-            payment_mode=payment_mode
-        )
+        # 4. Settlement happens in bulk in the background (settlement_batcher)
+
+        db.flush()  # get payment_id
+        # Encoded up front so a replay returns exactly this body
+        response = jsonable_encoder({
+            column.key: getattr(payment, column.key)
+            for column in Payment.__mapper__.column_attrs
+        })
+        if idempotency_key:
+            idempotency_store.record(db, rider_id, idempotency_key, response)
 
         db.commit()
-        db.refresh(payment)
 
-        return payment
+        if idempotency_key:
+            idempotency_store.remember(rider_id, idempotency_key, hash_, response)
+
+        return response
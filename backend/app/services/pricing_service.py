@@ -1,12 +1,31 @@
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+import numpy as np
+
+from app.core.config import QUOTE_ROAD_FACTOR, QUOTE_AVG_SPEED_KMPH
 from app.models.trips import RideRequest
-from app.models.core import Tenant
-from app.models.pricing import FareConfig   
+from app.services.fare_rules import fare_rules
+from app.services.fare_snapshot import fare_snapshot
+from app.services.quote_cache import quote_cache
+from app.services.surge_service import surge_engine
+from app.services.zone_service import zone_resolver
+from app.utils.dispatch_attempt import haversine
 
 class PricingService:
 
+    @staticmethod
+    def estimate_route(pickup_lat, pickup_lng, drop_lat, drop_lng):
+        """Road distance (km) and duration (minutes) from the straight line"""
+        distance_km = haversine(
+            float(pickup_lat), float(pickup_lng),
+            float(drop_lat), float(drop_lng)
+        ) * QUOTE_ROAD_FACTOR
+        duration_minutes = distance_km / QUOTE_AVG_SPEED_KMPH * 60
+        return distance_km, duration_minutes
+
     @staticmethod
     def estimate_prices(db: Session, ride_request_id: int):
         # 1️⃣ Fetch ride request
@@ -19,45 +38,80 @@ class PricingService:
         if not ride_request:
             raise HTTPException(status_code=404, detail="Ride request not found")
 
-        # 2️⃣ Get active tenants
-        tenants = (
-            db.query(Tenant)
-            .filter(Tenant.status == "ACTIVE")
-            .all()
-        )
+        # 2️⃣ Every active tenant's fares for the city, from memory
+        fares = fare_snapshot.for_city(db, ride_request.city_id)
 
-        results = []
-
-        # 3️⃣ Loop tenants → fare configs
-        for tenant in tenants:
-            fare_configs = (
-                db.query(FareConfig)
-                .filter(
-                    FareConfig.tenant_id == tenant.tenant_id,
-                    FareConfig.city_id == ride_request.city_id
-                )
-                .all()
-            )
-
-            for fare in fare_configs:
-                # 🔹 Simple MVP pricing logic
-                estimated_fare = (
-                    float(fare.base_fare)
-                    + float(fare.per_km) * 5
-                    + float(fare.per_minute) * 10
-                )
-
-                results.append({
-                    "tenant_id": tenant.tenant_id,
-                    "tenant_name": tenant.name,
-                    "vehicle_category": fare.vehicle_category,
-                    "estimated_fare": round(estimated_fare, 2)
-                })
-
-        if not results:
+        if not fares:
             raise HTTPException(
                 status_code=404,
                 detail="No pricing available for this request"
             )
 
-        return results
+        zone_id = ride_request.zone_id
+        if zone_id is None:
+            zone_id = zone_resolver.zone_for(
+                db, ride_request.city_id, ride_request.pickup_lat, ride_request.pickup_lng
+            )
+
+        # 3️⃣ Riders refreshing from the same cells share one result
+        key = quote_cache.key(
+            ride_request.city_id,
+            zone_id,
+            ride_request.pickup_lat, ride_request.pickup_lng,
+            ride_request.drop_lat, ride_request.drop_lng,
+            (surge_engine.version, fare_snapshot.generation, fare_rules.generation)
+        )
+        return quote_cache.get_or_compute(
+            key,
+            lambda: PricingService._quote(db, ride_request, fares, zone_id)
+        )
+
+    @staticmethod
+    def _quote(db: Session, ride_request: RideRequest, fares, zone_id):
+        distance_km, duration_minutes = PricingService.estimate_route(
+            ride_request.pickup_lat, ride_request.pickup_lng,
+            ride_request.drop_lat, ride_request.drop_lng
+        )
+
+        # Live surge of each tenant in the pickup zone, from memory
+        multipliers = np.array(
+            [surge_engine.multiplier(tenant_id, zone_id) for tenant_id in fares.tenant_ids]
+        )
+
+        # Time-of-day rules (night, peak) in effect now, also from memory
+        now = datetime.now(timezone.utc)
+        time_multipliers = np.array([
+            fare_rules.time_multiplier(db, tenant_id, ride_request.city_id, now)
+            for tenant_id in fares.tenant_ids
+        ])
+
+        # Price all tenant x vehicle category rows in one pass
+        estimated = (
+            np.maximum(
+                fares.base_fare
+                + fares.per_km * distance_km
+                + fares.per_minute * duration_minutes,
+                fares.minimum_fare
+            )
+            * time_multipliers
+            * multipliers
+        ).round(2)
+
+        return [
+            {
+                "tenant_id": tenant_id,
+                "tenant_name": tenant_name,
+                "vehicle_category": category,
+                "estimated_fare": fare,
+                "distance_km": round(distance_km, 2),
+                "duration_minutes": round(duration_minutes, 1),
+                "surge_multiplier": multiplier
+            }
+            for tenant_id, tenant_name, category, fare, multiplier in zip(
+                fares.tenant_ids,
+                fares.tenant_names,
+                fares.vehicle_categories,
+                estimated.tolist(),
+                multipliers.tolist()
+            )
+        ]
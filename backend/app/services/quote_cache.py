@@ -0,0 +1,60 @@
+import time
+
+from app.core.config import (
+    QUOTE_CACHE_SIZE,
+    QUOTE_CACHE_TTL_SECONDS,
+    QUOTE_GEOHASH_PRECISION,
+    QUOTE_TIME_BUCKET_SECONDS
+)
+from app.utils import geohash
+from app.utils.metrics import counters
+from app.utils.single_flight import SingleFlight
+from app.utils.ttl_cache import TTLCache, MISSING
+
+
+class QuoteCache:
+    """
+    Reuses estimate results for riders asking the same question.
+
+    Keys are built by ``key()``: city, pickup zone, pickup and drop geohash
+    cells, a wall-clock time bucket and the versions of everything else a
+    price depends on (surge multipliers, fare config, time/tax rules), so a
+    change to any of them makes new keys instead of needing invalidation.
+    Concurrent misses on one key are coalesced into a single computation.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(QUOTE_CACHE_SIZE, QUOTE_CACHE_TTL_SECONDS)
+        self._in_flight = SingleFlight()
+
+    @staticmethod
+    def key(city_id, zone_id, pickup_lat, pickup_lng, drop_lat, drop_lng, versions):
+        return (
+            city_id,
+            zone_id,
+            geohash.encode(float(pickup_lat), float(pickup_lng), QUOTE_GEOHASH_PRECISION),
+            geohash.encode(float(drop_lat), float(drop_lng), QUOTE_GEOHASH_PRECISION),
+            int(time.time() // QUOTE_TIME_BUCKET_SECONDS),
+            versions
+        )
+
+    def get_or_compute(self, key, compute):
+        quotes = self._cache.get(key)
+        if quotes is not MISSING:
+            counters.inc("quote_cache.hit")
+            return quotes
+
+        def load():
+            result = compute()
+            self._cache.set(key, result)
+            return result
+
+        quotes, shared = self._in_flight.do(key, load)
+        counters.inc("quote_cache.coalesced" if shared else "quote_cache.miss")
+        return quotes
+
+    def clear(self):
+        self._cache.clear()
+
+
+quote_cache = QuoteCache()
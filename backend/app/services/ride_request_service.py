@@ -5,13 +5,16 @@ from datetime import datetime, timezone
 from app.models.trips import RideRequest,Trip
 from app.models.identity import AppUser
 from app.schemas.ride_request import RideRequestCreate
-from app.models.fleet import DriverProfile
-from app.models.operations import DriverShift
-from app.models.operations import DriverLocation,DriverLocationHistory
 from app.models.dispatch import DispatchAttempt
 from app.models.core import Tenant
 from app.models.pricing import FareConfig
-from app.utils.dispatch_attempt import haversine
+from app.core.config import DISPATCH_CANDIDATES, DISPATCH_MODE
+from app.services.driver_index_sync import driver_index_sync
+from app.services.batch_dispatch_service import batch_dispatcher
+from app.services.dispatch_expiry_service import dispatch_scheduler
+from app.services.offer_push_service import offer_hub
+from app.services.surge_service import surge_engine
+from app.services.zone_service import zone_resolver
 
 
 
@@ -65,6 +68,9 @@ class RideRequestService:
         request = RideRequest(
             rider_id=user.user_id,
             city_id=data.city_id,
+            zone_id=zone_resolver.zone_for(
+                db, data.city_id, data.pickup_lat, data.pickup_lng
+            ),
             pickup_lat=data.pickup_lat,
             pickup_lng=data.pickup_lng,
             drop_lat=data.drop_lat,
@@ -147,6 +153,9 @@ class RideRequestService:
             tenant_id=data.tenant_id,
             rider_id=user.user_id,
             city_id=ride_request.city_id,
+            zone_id=ride_request.zone_id,
+            vehicle_category=data.vehicle_category,
+            surge_multiplier=surge_engine.multiplier(data.tenant_id, ride_request.zone_id),
             pickup_lat=ride_request.pickup_lat,
             pickup_lng=ride_request.pickup_lng,
             drop_lat=ride_request.drop_lat,
@@ -162,44 +171,35 @@ class RideRequestService:
         # 5️⃣ Mark ride request confirmed
         ride_request.status = "CONFIRMED"
 
-        # 6️⃣ Dispatch (reuse your logic)
-        drivers = (
-            db.query(DriverProfile, DriverLocation)
-            .join(DriverShift, DriverShift.driver_id == DriverProfile.driver_id)
-            .join(DriverLocation, DriverLocation.driver_id == DriverProfile.driver_id)
-            .filter(
-                DriverProfile.tenant_id == data.tenant_id,
-                DriverProfile.approval_status == "APPROVED",
-                DriverShift.ended_at.is_(None)
-            )
-            .all()
+        # 6️⃣ Dispatch to the nearest drivers of this tenant
+        selected_drivers = driver_index_sync.nearest_available(
+            db,
+            ride_request.pickup_lat,
+            ride_request.pickup_lng,
+            k=DISPATCH_CANDIDATES,
+            city_id=ride_request.city_id,
+            tenant_id=data.tenant_id
         )
 
-        if not drivers:
+        if not selected_drivers:
             raise HTTPException(
                 status_code=404,
                 detail="No drivers available for selected tenant"
             )
 
-        driver_distances = []
-        for profile, location in drivers:
-            distance = haversine(
-                ride_request.pickup_lat,
-                ride_request.pickup_lng,
-                location.latitude,
-                location.longitude
-            )
-            driver_distances.append((profile, distance))
-
-        driver_distances.sort(key=lambda x: x[1])
-        selected_drivers = driver_distances[:3]
+        if DISPATCH_MODE == "BATCHED":
+            # Offers go out with the next matching window for this city
+            db.commit()
+            db.refresh(trip)
+            batch_dispatcher.enqueue(trip)
+            return trip
 
         now = datetime.now(timezone.utc)
-        for profile, _ in selected_drivers:
+        for driver_id, _ in selected_drivers:
             db.add(
                 DispatchAttempt(
                     trip_id=trip.trip_id,
-                    driver_id=profile.driver_id,
+                    driver_id=driver_id,
                     sent_at=now,
                     response="SENT",
                     created_by=user.user_id
@@ -209,5 +209,8 @@ class RideRequestService:
         db.commit()
         db.refresh(trip)
 
+        dispatch_scheduler.track(trip.trip_id)
+        offer_hub.offer([driver_id for driver_id, _ in selected_drivers], trip)
+
         return trip
 
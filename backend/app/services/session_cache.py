@@ -0,0 +1,181 @@
+import logging
+import select
+import threading
+from collections import namedtuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import (
+    SESSION_CACHE_SIZE,
+    SESSION_CACHE_TTL_SECONDS,
+    SESSION_CACHE_LISTEN
+)
+from app.core.database import engine
+from app.models.identity import AppUser
+from app.utils.metrics import counters
+from app.utils.ttl_cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+# Sent by the app_user / user_session triggers, see RideSharing.sql
+INVALIDATION_CHANNEL = "auth_invalidation"
+INVALIDATION_TRIGGERS = (
+    "trg_app_user_auth_invalidation",
+    "trg_user_session_auth_invalidation",
+)
+
+CachedSession = namedtuple("CachedSession", ["user_id", "expires_at", "user"])
+
+
+def snapshot_user(user: AppUser) -> AppUser:
+    """A detached copy of the user's columns, safe to share between requests"""
+    copy = AppUser(**{
+        column.key: getattr(user, column.key)
+        for column in AppUser.__mapper__.column_attrs
+    })
+    make_transient_to_detached(copy)
+    return copy
+
+
+class SessionCache:
+    """
+    Validated sessions, session_id -> CachedSession, so an authenticated
+    request normally runs no auth query. ``db.merge(user, load=False)``
+    hands each request its own persistent AppUser without touching the
+    database.
+
+    Entries live at most SESSION_CACHE_TTL_SECONDS and never past the
+    session's expiry. Logout invalidates the session here; with
+    SESSION_CACHE_LISTEN every worker also LISTENs on
+    INVALIDATION_CHANNEL, which triggers notify on any change to a session
+    or user, including changes made outside the app. The cache is only
+    used while that LISTEN is in place: it is bypassed until the first
+    LISTEN and whenever the listener is down, and cleared after each
+    (re)LISTEN, since notifications may have been missed meanwhile. If the
+    triggers are not installed, caching is turned off at startup.
+
+    A lookup that races an invalidation must not cache what it read: take
+    ``generation(session_id)`` before querying and pass it to ``set``.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL_SECONDS)
+        self._enabled = True
+        # Without SESSION_CACHE_LISTEN only the TTL bounds staleness
+        self._listening = not SESSION_CACHE_LISTEN
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, session_id: str):
+        if not (self._enabled and self._listening):
+            return None
+        entry = self._cache.get(session_id)
+        if entry is MISSING:
+            counters.inc("session_cache.miss")
+            return None
+        counters.inc("session_cache.hit")
+        return entry
+
+    def generation(self, session_id: str):
+        return self._cache.generation(session_id)
+
+    def set(self, session_id: str, user: AppUser, expires_at, now, generation):
+        """Cache the session unless it or any user was invalidated since ``generation``"""
+        ttl = min(SESSION_CACHE_TTL_SECONDS, (expires_at - now).total_seconds())
+        if self._enabled and self._listening and ttl > 0:
+            self._cache.set_if_current(
+                session_id,
+                CachedSession(user.user_id, expires_at, snapshot_user(user)),
+                generation,
+                ttl_seconds=ttl
+            )
+
+    def invalidate_session(self, session_id: str):
+        self._cache.invalidate(session_id)
+
+    def invalidate_user(self, user_id: int):
+        # Also voids every generation handed out, so in-flight lookups of
+        # this user's sessions are not cached
+        self._cache.invalidate_where(lambda entry: entry.user_id == user_id)
+
+    # ---- cross-worker invalidation ---------------------------------
+
+    def start(self):
+        if self._thread or not SESSION_CACHE_LISTEN:
+            return
+
+        missing = self._missing_triggers()
+        if missing:
+            logger.warning(
+                "Session cache disabled: invalidation triggers %s are missing, "
+                "apply the session cache section of RideSharing.sql",
+                ", ".join(missing)
+            )
+            self._enabled = False
+            self._cache.clear()
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="session-cache-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    @staticmethod
+    def _missing_triggers():
+        with engine.connect() as connection:
+            present = set(connection.execute(
+                text("SELECT tgname FROM pg_trigger WHERE tgname = ANY(:names) AND NOT tgisinternal"),
+                {"names": list(INVALIDATION_TRIGGERS)}
+            ).scalars())
+        return [name for name in INVALIDATION_TRIGGERS if name not in present]
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Session invalidation listener failed")
+            self._listening = False
+            self._stop.wait(5)
+
+    def _listen(self):
+        connection = engine.raw_connection()
+        try:
+            dbapi = connection.dbapi_connection
+            dbapi.autocommit = True
+            cursor = dbapi.cursor()
+            cursor.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+            cursor.close()
+
+            # Anything may have changed while we were not listening; the
+            # clear also voids generations handed out before this point
+            self._cache.clear()
+            self._listening = True
+
+            while not self._stop.is_set():
+                if select.select([dbapi], [], [], 1.0)[0]:
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        self._apply(dbapi.notifies.pop(0).payload)
+        finally:
+            connection.invalidate()
+
+    def _apply(self, payload: str):
+        kind, _, key = payload.partition(":")
+        if kind == "session":
+            self.invalidate_session(key)
+        elif kind == "user":
+            self.invalidate_user(int(key))
+        counters.inc("session_cache.remote_invalidations")
+
+
+session_cache = SessionCache()
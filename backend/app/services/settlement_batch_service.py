@@ -0,0 +1,158 @@
+import logging
+import threading
+
+from sqlalchemy import select, update, func
+
+from app.core.config import SETTLEMENT_BATCH_SECONDS, SETTLEMENT_BATCH_SIZE
+from app.core.database import SessionLocal
+from app.models.payments import Payment
+from app.models.trips import Trip
+from app.services.settlement_service import PAYMENT_MODES, SettlementItem, settle_batch
+from app.utils.metrics import counters
+
+logger = logging.getLogger(__name__)
+
+
+class SettlementBatcher:
+    """
+    Settles successful payments in the background, so recording a payment
+    is a single insert.
+
+    A payment is unsettled while its settled_at is NULL; every
+    SETTLEMENT_BATCH_SECONDS the unsettled payments are taken in batches of
+    SETTLEMENT_BATCH_SIZE and settled together by ``settle_batch``, which
+    sets settled_at in the same transaction. Batches are claimed with FOR
+    UPDATE SKIP LOCKED, and a worker that locks a row only after another
+    committed it re-checks settled_at, so no payment is settled twice. A
+    crash simply leaves the batch unsettled for the next run.
+
+    A payment that cannot be settled (unknown payment mode, no driver, or a
+    failure of its own when the batch is retried row by row) gets
+    settlement_error and is skipped from then on, instead of failing every
+    batch it lands in.
+    """
+
+    def __init__(self, interval_seconds: float = SETTLEMENT_BATCH_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="settlement-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.settle_pending()
+            except Exception:
+                logger.exception("Payment settlement batch failed")
+
+    @staticmethod
+    def _unsettled(limit: int):
+        return (
+            select(
+                Payment.payment_id,
+                Payment.trip_id,
+                Trip.tenant_id,
+                Trip.driver_id,
+                Payment.amount,
+                Payment.payment_mode
+            )
+            .join(Trip, Trip.trip_id == Payment.trip_id)
+            .where(
+                Payment.status == "SUCCESS",
+                Payment.settled_at.is_(None),
+                Payment.settlement_error.is_(None)
+            )
+            .order_by(Payment.payment_id)
+            .limit(limit)
+            .with_for_update(of=Payment, skip_locked=True)
+        )
+
+    def settle_pending(self, batch_size: int = SETTLEMENT_BATCH_SIZE) -> int:
+        """Settle everything currently unsettled; returns the number of payments"""
+        total = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                rows = db.execute(self._unsettled(batch_size)).all()
+                settled = self._settle(db, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            total += settled
+            counters.inc("settlement.payments_settled", settled)
+            if len(rows) < batch_size:
+                break
+
+        return total
+
+    def _settle(self, db, rows) -> int:
+        """Settle the claimed rows in the caller's transaction; returns how many"""
+        valid = []
+        for row in rows:
+            if row.payment_mode not in PAYMENT_MODES:
+                self._flag(db, row.payment_id, f"unknown payment mode {row.payment_mode!r}")
+            elif row.driver_id is None:
+                self._flag(db, row.payment_id, "trip has no driver")
+            else:
+                valid.append(row)
+
+        if not valid:
+            return 0
+
+        try:
+            with db.begin_nested():
+                self._apply(db, valid)
+            return len(valid)
+        except Exception:
+            logger.exception("Settling %s payments failed; retrying one by one", len(valid))
+
+        settled = 0
+        for row in valid:
+            try:
+                with db.begin_nested():
+                    self._apply(db, [row])
+                settled += 1
+            except Exception as exc:
+                self._flag(db, row.payment_id, str(exc))
+        return settled
+
+    @staticmethod
+    def _apply(db, rows):
+        settle_batch(db, [SettlementItem(*row[1:]) for row in rows])
+        db.execute(
+            update(Payment)
+            .where(Payment.payment_id.in_([row.payment_id for row in rows]))
+            .values(settled_at=func.now())
+        )
+
+    @staticmethod
+    def _flag(db, payment_id: int, error: str):
+        logger.warning("Payment %s cannot be settled: %s", payment_id, error)
+        db.execute(
+            update(Payment)
+            .where(Payment.payment_id == payment_id)
+            .values(settlement_error=error)
+        )
+        counters.inc("settlement.payments_flagged")
+
+
+settlement_batcher = SettlementBatcher()
@@ -1,6 +1,11 @@
+from collections import defaultdict, namedtuple
+
+from sqlalchemy import func, insert, update, values, column, BigInteger, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
+from app.core.config import PLATFORM_WALLET_STRIPES
 from app.models.trips import Trip
 from app.models.payments import PlatformWallet, TenantWallet, DriverWallet
 from app.models.ledger import PlatformLedger, TenantLedger
@@ -8,83 +13,151 @@ from app.models.ledger import PlatformLedger, TenantLedger
 PLATFORM_PERCENT = 0.20   # 20%
 TENANT_PERCENT = 0.10     # 10%
 # Driver gets remaining 70%
+PAYMENT_MODES = ("ONLINE", "CASH")
 
-def settle_payment(db: Session, trip: Trip, amount: float, payment_mode: str):
-    # -----------------------------
-    # 1. Calculate split
-    # -----------------------------
-    platform_fee = round(amount * PLATFORM_PERCENT, 2)
-    tenant_fee = round(amount * TENANT_PERCENT, 2)
-    driver_earning = round(amount - platform_fee - tenant_fee, 2)
 
-    # -----------------------------
-    # 2. Load or create wallets
-    # -----------------------------
-    platform_wallet = db.query(PlatformWallet).first()
-    if not platform_wallet:
-        platform_wallet = PlatformWallet(balance=0)
-        db.add(platform_wallet)
-
-    tenant_wallet = (
-        db.query(TenantWallet)
-        .filter(TenantWallet.tenant_id == trip.tenant_id)
-        .first()
-    )
-    if not tenant_wallet:
-        tenant_wallet = TenantWallet(
-            tenant_id=trip.tenant_id,
-            balance=0
-        )
-        db.add(tenant_wallet)
+def platform_stripe(trip_id: int) -> int:
+    """platform_wallet row credited for a trip; the balance is the sum of all rows"""
+    return trip_id % PLATFORM_WALLET_STRIPES + 1
 
-    driver_wallet = (
-        db.query(DriverWallet)
-        .filter(DriverWallet.driver_id == trip.driver_id)
-        .first()
-    )
-    if not driver_wallet:
-        driver_wallet = DriverWallet(
-            driver_id=trip.driver_id,
-            balance=0
+
+def platform_balance(db: Session):
+    return db.query(func.coalesce(func.sum(PlatformWallet.balance), 0)).scalar()
+
+
+def increment_wallets(db: Session, model, key_column, deltas: dict):
+    """
+    Add ``deltas`` ({key: amount}) to the balance of ``model`` rows in one
+    INSERT ... ON CONFLICT DO UPDATE, creating missing wallets. The
+    increment happens inside PostgreSQL, so concurrent writers never lose
+    an update, and rows are locked in key order so they cannot deadlock.
+    """
+    rows = [
+        {key_column.key: key, "balance": amount}
+        for key, amount in sorted(deltas.items())
+        if amount
+    ]
+    if not rows:
+        return
+
+    upsert = pg_insert(model).values(rows)
+    db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={
+                "balance": model.balance + upsert.excluded.balance,
+                "updated_on": func.now()
+            }
         )
-        db.add(driver_wallet)
+    )
+
+
+SettlementItem = namedtuple(
+    "SettlementItem",
+    ["trip_id", "tenant_id", "driver_id", "amount", "payment_mode"]
+)
+
+
+def split(amount: float, payment_mode: str):
+    """
+    ``(platform_fee, tenant_fee, driver_earning, platform_delta,
+    driver_delta)`` of one payment; the tenant wallet always gains its fee.
+    """
+    platform_fee = round(amount * PLATFORM_PERCENT, 2)
+    tenant_fee = round(amount * TENANT_PERCENT, 2)
+    driver_earning = round(amount - platform_fee - tenant_fee, 2)
 
-    # -----------------------------
-    # 3. Apply ONLINE / CASH logic
-    # -----------------------------
     if payment_mode == "ONLINE":
         # Money collected by platform
-        platform_wallet.balance += amount
-        tenant_wallet.balance += tenant_fee
-        driver_wallet.balance += driver_earning
+        return platform_fee, tenant_fee, driver_earning, amount, driver_earning
 
-    elif payment_mode == "CASH":
+    if payment_mode == "CASH":
         # Money collected by driver
-        platform_wallet.balance += platform_fee
-        tenant_wallet.balance += tenant_fee
-        driver_wallet.balance -= (platform_fee + tenant_fee)
+        return platform_fee, tenant_fee, driver_earning, platform_fee, -(platform_fee + tenant_fee)
 
-    else:
-        raise HTTPException(400, "Invalid payment mode")
+    raise HTTPException(400, "Invalid payment mode")
+
+
+def settle_batch(db: Session, items):
+    """
+    Settle many payments in the caller's transaction: one bulk insert per
+    ledger, one UPDATE for the trips' earnings and one aggregated increment
+    per wallet table, however many payments there are.
+    """
+    platform_ledger = []
+    tenant_ledger = []
+    earnings = []
+    platform_deltas = defaultdict(float)
+    tenant_deltas = defaultdict(float)
+    driver_deltas = defaultdict(float)
+
+    for item in items:
+        amount = float(item.amount)
+        platform_fee, tenant_fee, driver_earning, platform_delta, driver_delta = split(
+            amount, item.payment_mode
+        )
+
+        platform_ledger.append({
+            "trip_id": item.trip_id,
+            "amount": platform_fee,
+            "entry_type": "COMMISSION"
+        })
+        tenant_ledger.append({
+            "tenant_id": item.tenant_id,
+            "trip_id": item.trip_id,
+            "amount": tenant_fee,
+            "entry_type": "COMMISSION"
+        })
+        earnings.append((item.trip_id, platform_fee, driver_earning))
+
+        platform_deltas[platform_stripe(item.trip_id)] += platform_delta
+        tenant_deltas[item.tenant_id] += tenant_fee
+        driver_deltas[item.driver_id] += driver_delta
+
+    if not earnings:
+        return
 
     # -----------------------------
-    # 4. Ledger entries (audit)
+    # Ledger entries (audit) and earnings on trips
     # -----------------------------
-    db.add(PlatformLedger(
-        trip_id=trip.trip_id,
-        amount=platform_fee,
-        entry_type="COMMISSION"
-    ))
+    db.execute(insert(PlatformLedger), platform_ledger)
+    db.execute(insert(TenantLedger), tenant_ledger)
 
-    db.add(TenantLedger(
-        tenant_id=trip.tenant_id,
-        trip_id=trip.trip_id,
-        amount=tenant_fee,
-        entry_type="COMMISSION"
-    ))
+    trip_earnings = values(
+        column("trip_id", BigInteger),
+        column("platform_fee", Numeric(10, 2)),
+        column("driver_earning", Numeric(10, 2)),
+        name="trip_earnings"
+    ).data(earnings)
+    db.execute(
+        update(Trip)
+        .where(Trip.trip_id == trip_earnings.c.trip_id)
+        .values(
+            platform_fee=trip_earnings.c.platform_fee,
+            driver_earning=trip_earnings.c.driver_earning
+        )
+    )
 
     # -----------------------------
-    # 5. Store earnings on trip
+    # Wallet increments, last so row locks are held as briefly as possible.
+    # The platform wallet is striped across PLATFORM_WALLET_STRIPES rows
+    # so concurrent settlements do not queue on one row.
     # -----------------------------
-    trip.platform_fee = platform_fee
-    trip.driver_earning = driver_earning
+    increment_wallets(db, PlatformWallet, PlatformWallet.id, _rounded(platform_deltas))
+    increment_wallets(db, TenantWallet, TenantWallet.tenant_id, _rounded(tenant_deltas))
+    increment_wallets(db, DriverWallet, DriverWallet.driver_id, _rounded(driver_deltas))
+
+
+def _rounded(deltas: dict) -> dict:
+    return {key: round(amount, 2) for key, amount in deltas.items()}
+
+
+def settle_payment(db: Session, trip: Trip, amount: float, payment_mode: str):
+    """Settle one payment right away, e.g. from an admin correction"""
+    settle_batch(db, [SettlementItem(
+        trip_id=trip.trip_id,
+        tenant_id=trip.tenant_id,
+        driver_id=trip.driver_id,
+        amount=amount,
+        payment_mode=payment_mode
+    )])
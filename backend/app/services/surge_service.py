@@ -0,0 +1,261 @@
+import logging
+import math
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    SURGE_TICK_SECONDS,
+    SURGE_REQUEST_WINDOW_SECONDS,
+    SURGE_MIN_DEMAND,
+    SURGE_SENSITIVITY,
+    SURGE_MAX_MULTIPLIER,
+    SURGE_STEP
+)
+from app.core.database import SessionLocal
+from app.models.core import Zone
+from app.models.fleet import DriverProfile
+from app.models.identity import AppUser
+from app.models.operations import DriverLocation, DriverShift
+from app.models.pricing import SurgeZone, SurgeEvent
+from app.models.trips import RideRequest, Trip
+from app.services.fare_snapshot import fare_snapshot
+from app.utils.metrics import counters
+from app.services.zone_service import zone_resolver
+
+logger = logging.getLogger(__name__)
+
+# Only one worker process recomputes surge at a time
+SURGE_LOCK_KEY = 72_003
+
+
+def surge_multiplier(demand: int, supply: int) -> float:
+    """
+    1.0 until open requests outnumber idle drivers, then rising by
+    SURGE_SENSITIVITY per unit of excess ratio, capped at
+    SURGE_MAX_MULTIPLIER and rounded down to SURGE_STEP so small swings in
+    the counts do not produce a new event every tick.
+    """
+    if demand < SURGE_MIN_DEMAND:
+        return 1.0
+
+    ratio = demand / max(supply, 1)
+    if ratio <= 1:
+        return 1.0
+
+    raw = min(1 + SURGE_SENSITIVITY * (ratio - 1), SURGE_MAX_MULTIPLIER)
+    steps = math.floor(round((raw - 1) / SURGE_STEP, 6))
+    return round(1 + steps * SURGE_STEP, 2)
+
+
+class SurgeEngine:
+    """
+    Live surge pricing per (tenant, surge zone).
+
+    Demand is the number of REQUESTED ride requests per zone younger than
+    SURGE_REQUEST_WINDOW_SECONDS. Supply is the number of idle, on-shift
+    drivers per tenant and zone. Both are counted in the database, so they
+    cover every worker process. Every SURGE_TICK_SECONDS the worker holding
+    the surge advisory lock recomputes the multipliers and closes/opens a
+    SurgeEvent only where one changed; the other workers reload the open
+    events. Quotes read the current multiplier from memory.
+    """
+
+    def __init__(self):
+        self._current = {}          # (tenant_id, zone_id) -> (multiplier, surge_id)
+        self.version = 0            # bumped whenever any multiplier changes
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---- read side -------------------------------------------------
+
+    def multiplier(self, tenant_id: int, zone_id) -> float:
+        if zone_id is None:
+            return 1.0
+        current = self._current.get((tenant_id, zone_id))
+        return current[0] if current else 1.0
+
+    # ---- demand ----------------------------------------------------
+
+    @staticmethod
+    def _demand(db: Session, now: datetime):
+        cutoff = now - timedelta(seconds=SURGE_REQUEST_WINDOW_SECONDS)
+        return Counter(dict(
+            db.query(RideRequest.zone_id, func.count())
+            .filter(
+                RideRequest.status == "REQUESTED",
+                RideRequest.created_on >= cutoff,
+                RideRequest.zone_id.isnot(None)
+            )
+            .group_by(RideRequest.zone_id)
+            .all()
+        ))
+
+    # ---- supply ----------------------------------------------------
+
+    @staticmethod
+    def _supply(db: Session):
+        busy = (
+            db.query(Trip.trip_id)
+            .filter(
+                Trip.driver_id == DriverProfile.driver_id,
+                Trip.status.in_(["ASSIGNED", "PICKED_UP"])
+            )
+            .exists()
+        )
+        idle = (
+            db.query(
+                AppUser.city_id,
+                DriverProfile.tenant_id,
+                DriverLocation.latitude,
+                DriverLocation.longitude
+            )
+            .join(AppUser, AppUser.user_id == DriverProfile.driver_id)
+            .join(DriverShift, DriverShift.driver_id == DriverProfile.driver_id)
+            .join(DriverLocation, DriverLocation.driver_id == DriverProfile.driver_id)
+            .filter(
+                DriverProfile.approval_status == "APPROVED",
+                DriverShift.ended_at.is_(None),
+                ~busy
+            )
+            .all()
+        )
+
+        by_city = {}
+        for city_id, tenant_id, lat, lng in idle:
+            by_city.setdefault(city_id, []).append((tenant_id, float(lat), float(lng)))
+
+        supply = Counter()
+        for city_id, drivers in by_city.items():
+            zones = zone_resolver.zones_for(
+                db,
+                city_id,
+                [lat for _, lat, _ in drivers],
+                [lng for _, _, lng in drivers]
+            )
+            for (tenant_id, _, _), zone_id in zip(drivers, zones):
+                if zone_id is not None:
+                    supply[(tenant_id, zone_id)] += 1
+        return supply
+
+    # ---- lifecycle -------------------------------------------------
+
+    @staticmethod
+    def _open_events(db: Session):
+        rows = (
+            db.query(SurgeEvent.tenant_id, SurgeZone.zone_id, SurgeEvent.multiplier, SurgeEvent.surge_id)
+            .join(SurgeZone, SurgeZone.surge_zone_id == SurgeEvent.surge_zone_id)
+            .filter(SurgeEvent.ended_at.is_(None))
+            .all()
+        )
+        return {
+            (tenant_id, zone_id): (float(multiplier), surge_id)
+            for tenant_id, zone_id, multiplier, surge_id in rows
+        }
+
+    def load(self, db: Session):
+        """Load the surge events still open, e.g. on startup"""
+        self._publish(self._open_events(db))
+
+    def _publish(self, current):
+        if current != self._current:
+            self._current = current
+            self.version += 1
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="surge-engine", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(SURGE_TICK_SECONDS):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Surge tick failed")
+
+    def tick(self):
+        db = SessionLocal()
+        try:
+            locked = db.execute(
+                text("SELECT pg_try_advisory_xact_lock(:key)"),
+                {"key": SURGE_LOCK_KEY}
+            ).scalar()
+            if not locked:
+                # Another worker recomputes; pick up what it recorded
+                self.load(db)
+                return
+
+            surge_zones = (
+                db.query(SurgeZone.zone_id, SurgeZone.surge_zone_id, Zone.city_id)
+                .join(Zone, Zone.zone_id == SurgeZone.zone_id)
+                .all()
+            )
+
+            now = datetime.now(timezone.utc)
+            demand = self._demand(db, now)
+            supply = self._supply(db)
+            # Start from the database: the last tick may have run elsewhere
+            current = self._open_events(db)
+            changed = 0
+
+            for zone_id, surge_zone_id, city_id in surge_zones:
+                fares = fare_snapshot.for_city(db, city_id)
+                if not fares:
+                    continue
+
+                for tenant_id in set(fares.tenant_ids):
+                    key = (tenant_id, zone_id)
+                    d, s = demand[zone_id], supply[key]
+                    multiplier = surge_multiplier(d, s)
+                    previous, surge_id = current.get(key, (1.0, None))
+
+                    if multiplier == previous:
+                        continue
+
+                    if surge_id:
+                        db.execute(
+                            update(SurgeEvent)
+                            .where(SurgeEvent.surge_id == surge_id)
+                            .values(ended_at=now)
+                        )
+
+                    if multiplier > 1:
+                        event = SurgeEvent(
+                            tenant_id=tenant_id,
+                            surge_zone_id=surge_zone_id,
+                            multiplier=multiplier,
+                            demand_index=d,
+                            supply_index=s,
+                            started_at=now
+                        )
+                        db.add(event)
+                        db.flush()
+                        current[key] = (multiplier, event.surge_id)
+                    else:
+                        current.pop(key, None)
+                    changed += 1
+
+            db.commit()
+            # Quotes only see the new multipliers once they are recorded
+            self._publish(current)
+            counters.inc("surge.events_changed", changed)
+        finally:
+            db.close()
+
+
+surge_engine = SurgeEngine()
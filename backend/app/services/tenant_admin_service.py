@@ -4,6 +4,10 @@ from fastapi import HTTPException, status
 from app.models.fleet import DriverProfile
 from app.models.tenant import TenantAdmin
 from app.models.identity import AppUser
+from app.utils.driver_index import driver_index
+from app.models.payments import TenantWallet
+from app.services.driver_eligibility_cache import driver_eligibility
+from app.services.ledger_snapshot_service import ledger_snapshots
 
 class TenantAdminService:
 
@@ -57,6 +61,8 @@ class TenantAdminService:
         driver.approval_status = "APPROVED"
         db.commit()
 
+        driver_eligibility.invalidate(driver_id)
+
     @staticmethod
     def reject_driver(db: Session, user: AppUser, driver_id: int):
         if user.role != "TENANT_ADMIN":
@@ -84,3 +90,29 @@ class TenantAdminService:
 
         driver.approval_status = "REJECTED"
         db.commit()
+
+        driver_eligibility.invalidate(driver_id)
+        driver_index.remove(driver_id)
+
+    @staticmethod
+    def get_balance(db: Session, user: AppUser, limit: int = 50):
+        if user.role != "TENANT_ADMIN":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only tenant admins can view the tenant balance"
+            )
+
+        tenant_id = TenantAdminService._get_admin_tenant(db, user)
+
+        wallet_balance = (
+            db.query(TenantWallet.balance)
+            .filter(TenantWallet.tenant_id == tenant_id)
+            .scalar()
+        )
+
+        return {
+            "tenant_id": tenant_id,
+            "wallet_balance": wallet_balance or 0,
+            "ledger_balance": ledger_snapshots.balance(db, "TENANT", tenant_id),
+            "entries": ledger_snapshots.statement(db, "TENANT", tenant_id, limit)
+        }
@@ -0,0 +1,284 @@
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text, insert, update, values, column, BigInteger, String
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    TENANT_PAYOUT_HOUR_UTC,
+    TENANT_PAYOUT_MIN_AMOUNT,
+    TENANT_PAYOUT_CHUNK_SIZE,
+    TENANT_PAYOUT_BACKEND,
+    TENANT_PAYOUT_ALLOW_LOCAL
+)
+from app.core.database import SessionLocal
+from app.models.ledger import TenantLedger
+from app.models.payments import TenantSettlement, TenantWallet
+from app.services.ledger_snapshot_service import ledger_snapshots
+from app.services.settlement_service import increment_wallets
+from app.utils.metrics import counters
+
+logger = logging.getLogger(__name__)
+
+
+class LocalPayoutBackend:
+    """
+    Pays nothing and approves everything, for development and tests.
+
+    A payout backend takes ``(settlement_id, tenant_id, amount)`` rows and
+    returns ``{settlement_id: reference}`` for the payouts it made; missing
+    ids count as failed. It is called with the settlements still locked and
+    may be called again for the same settlement after a crash, so real
+    backends must pass settlement_id to the provider as an idempotency key.
+    """
+
+    def pay(self, settlements) -> dict:
+        return {
+            settlement_id: f"local-{uuid.uuid5(uuid.NAMESPACE_OID, str(settlement_id))}"
+            for settlement_id, _, _ in settlements
+        }
+
+
+PAYOUT_BACKENDS = {
+    "local": LocalPayoutBackend,
+}
+
+
+def configured_backend():
+    """
+    The TENANT_PAYOUT_BACKEND instance, or None when payouts are not
+    configured. The local backend would mark real balances paid, so it is
+    refused unless TENANT_PAYOUT_ALLOW_LOCAL is set.
+    """
+    if TENANT_PAYOUT_BACKEND is None:
+        return None
+    if TENANT_PAYOUT_BACKEND == "local" and not TENANT_PAYOUT_ALLOW_LOCAL:
+        raise RuntimeError(
+            "TENANT_PAYOUT_BACKEND is 'local', which pays nothing; "
+            "set TENANT_PAYOUT_ALLOW_LOCAL for development or configure a real backend"
+        )
+    return PAYOUT_BACKENDS[TENANT_PAYOUT_BACKEND]()
+
+
+def next_run_at(now: datetime) -> datetime:
+    """The next TENANT_PAYOUT_HOUR_UTC o'clock after ``now``"""
+    run = now.astimezone(timezone.utc).replace(
+        hour=TENANT_PAYOUT_HOUR_UTC, minute=0, second=0, microsecond=0
+    )
+    if run <= now:
+        run += timedelta(days=1)
+    return run
+
+
+# One statement per chunk: pick tenants that are owed, create their
+# settlements, book the payouts in tenant_ledger and debit the wallets, so
+# a wallet always holds what is not yet being paid out.
+CREATE_SETTLEMENTS_SQL = text("""
+    WITH owed AS (
+        SELECT w.tenant_id, w.balance AS amount
+        FROM tenant_wallet w
+        WHERE w.balance >= :min_amount
+          AND w.tenant_id <> ALL(CAST(:skip AS BIGINT[]))
+          AND NOT EXISTS (
+              SELECT 1 FROM tenant_settlement s
+              WHERE s.tenant_id = w.tenant_id AND s.status = 'PENDING'
+          )
+        ORDER BY w.tenant_id
+        LIMIT :chunk
+        FOR UPDATE OF w SKIP LOCKED
+    ),
+    created AS (
+        INSERT INTO tenant_settlement (tenant_id, amount, status, requested_at)
+        SELECT tenant_id, amount, 'PENDING', :now FROM owed
+        RETURNING settlement_id, tenant_id, amount
+    ),
+    booked AS (
+        INSERT INTO tenant_ledger (tenant_id, amount, entry_type)
+        SELECT tenant_id, -amount, 'PAYOUT' FROM created
+    )
+    UPDATE tenant_wallet w
+    SET balance = w.balance - created.amount, updated_on = now()
+    FROM created
+    WHERE w.tenant_id = created.tenant_id
+""")
+
+
+class TenantPayoutProcessor:
+    """
+    Pays tenants what their wallets hold, daily at TENANT_PAYOUT_HOUR_UTC.
+    Nothing runs unless TENANT_PAYOUT_BACKEND is configured.
+
+    ``create_settlements`` turns every tenant wallet of at least
+    TENANT_PAYOUT_MIN_AMOUNT into a PENDING tenant_settlement, a PAYOUT
+    ledger entry and a wallet debit, set-based and TENANT_PAYOUT_CHUNK_SIZE
+    tenants per transaction. Tenants whose wallet disagrees with their
+    ledger are skipped and logged.
+
+    ``process_settlements`` sends PENDING settlements to the payout backend
+    in chunks, each claimed with FOR UPDATE SKIP LOCKED and committed with
+    its results. Failed payouts are reversed into the wallet. A crash loses
+    at most the chunk in flight, which is still PENDING on the next run.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        if self.backend is None:
+            self.backend = configured_backend()
+        if self.backend is None:
+            logger.info("Tenant payouts are off: TENANT_PAYOUT_BACKEND is not set")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="tenant-payouts", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            if self._stop.wait((next_run_at(now) - now).total_seconds()):
+                return
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Tenant payout run failed")
+
+    def run_once(self):
+        if self.backend is None:
+            self.backend = configured_backend()
+        if self.backend is None:
+            return
+        created = self.create_settlements()
+        paid, failed = self.process_settlements()
+        logger.info(
+            "Tenant payouts: %s settlements created, %s paid, %s failed",
+            created, paid, failed
+        )
+
+    def create_settlements(self) -> int:
+        db = SessionLocal()
+        try:
+            mismatched = ledger_snapshots.reconcile_tenants(db)
+            for tenant_id, wallet_balance, ledger_balance in mismatched:
+                logger.warning(
+                    "Tenant %s not paid out: wallet %s != ledger %s",
+                    tenant_id, wallet_balance, ledger_balance
+                )
+            skip = [tenant_id for tenant_id, _, _ in mismatched]
+
+            total = 0
+            while not self._stop.is_set():
+                created = db.execute(CREATE_SETTLEMENTS_SQL, {
+                    "min_amount": TENANT_PAYOUT_MIN_AMOUNT,
+                    "skip": skip,
+                    "chunk": TENANT_PAYOUT_CHUNK_SIZE,
+                    "now": datetime.now(timezone.utc)
+                }).rowcount
+                db.commit()
+
+                total += created
+                if created < TENANT_PAYOUT_CHUNK_SIZE:
+                    break
+        finally:
+            db.close()
+
+        counters.inc("tenant_payout.settlements_created", total)
+        return total
+
+    def process_settlements(self):
+        paid = failed = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                settlements = (
+                    db.query(
+                        TenantSettlement.settlement_id,
+                        TenantSettlement.tenant_id,
+                        TenantSettlement.amount
+                    )
+                    .filter(TenantSettlement.status == "PENDING")
+                    .order_by(TenantSettlement.settlement_id)
+                    .limit(TENANT_PAYOUT_CHUNK_SIZE)
+                    .with_for_update(skip_locked=True)
+                    .all()
+                )
+                if not settlements:
+                    break
+
+                references = self.backend.pay(settlements)
+                self._record(db, settlements, references)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            paid += len(references)
+            failed += len(settlements) - len(references)
+            if len(settlements) < TENANT_PAYOUT_CHUNK_SIZE:
+                break
+
+        counters.inc("tenant_payout.paid", paid)
+        counters.inc("tenant_payout.failed", failed)
+        return paid, failed
+
+    @staticmethod
+    def _record(db: Session, settlements, references: dict):
+        now = datetime.now(timezone.utc)
+        results = values(
+            column("settlement_id", BigInteger),
+            column("status", String),
+            column("payout_reference", String),
+            name="results"
+        ).data([
+            (
+                settlement_id,
+                "COMPLETED" if settlement_id in references else "FAILED",
+                references.get(settlement_id)
+            )
+            for settlement_id, _, _ in settlements
+        ])
+        db.execute(
+            update(TenantSettlement)
+            .where(TenantSettlement.settlement_id == results.c.settlement_id)
+            .values(
+                status=results.c.status,
+                payout_reference=results.c.payout_reference,
+                processed_at=now
+            )
+        )
+
+        # A failed payout goes back into the wallet
+        reversed_ = [
+            (tenant_id, amount)
+            for settlement_id, tenant_id, amount in settlements
+            if settlement_id not in references
+        ]
+        if reversed_:
+            db.execute(insert(TenantLedger), [
+                {"tenant_id": tenant_id, "amount": amount, "entry_type": "PAYOUT_REVERSAL"}
+                for tenant_id, amount in reversed_
+            ])
+            deltas = {}
+            for tenant_id, amount in reversed_:
+                deltas[tenant_id] = deltas.get(tenant_id, 0) + amount
+            increment_wallets(db, TenantWallet, TenantWallet.tenant_id, deltas)
+
+
+tenant_payouts = TenantPayoutProcessor()
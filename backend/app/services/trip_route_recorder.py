@@ -0,0 +1,131 @@
+import logging
+import threading
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import TRIP_ROUTE_CHUNK_POINTS, TRIP_ROUTE_FLUSH_SECONDS
+from app.core.database import SessionLocal
+from app.models.trips import TripRouteChunk
+from app.utils.metrics import counters
+from app.utils.route_codec import encode_route, decode_route, to_epoch_ms, from_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_rows(trip_id: int, points):
+    rows = []
+    for i in range(0, len(points), TRIP_ROUTE_CHUNK_POINTS):
+        chunk = points[i:i + TRIP_ROUTE_CHUNK_POINTS]
+        rows.append({
+            "trip_id": trip_id,
+            "point_count": len(chunk),
+            "started_at": from_epoch_ms(chunk[0][2]),
+            "ended_at": from_epoch_ms(chunk[-1][2]),
+            "points": encode_route(chunk)
+        })
+    return rows
+
+
+class TripRouteRecorder:
+    """
+    Collects the fixes of drivers on a PICKED_UP trip and writes them as
+    delta-encoded trip_route_chunk rows: once a trip has
+    TRIP_ROUTE_CHUNK_POINTS waiting, every TRIP_ROUTE_FLUSH_SECONDS, and
+    when the trip completes. Points whose write fails are put back and
+    retried on the next flush.
+    """
+
+    def __init__(self):
+        self._pending = {}   # trip_id -> [(lat, lng, epoch_ms)]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, trip_id: int, fixes):
+        """``fixes`` are ``(latitude, longitude, recorded_at)`` in time order"""
+        points = [(lat, lng, to_epoch_ms(ts)) for lat, lng, ts in fixes]
+        with self._lock:
+            pending = self._pending.setdefault(trip_id, [])
+            pending.extend(points)
+            full = len(pending) >= TRIP_ROUTE_CHUNK_POINTS
+
+        if full:
+            self._wake.set()
+
+    def pending(self, trip_id: int):
+        """Points of ``trip_id`` not written yet, decoded like stored ones"""
+        with self._lock:
+            points = list(self._pending.get(trip_id, ()))
+        return decode_route(encode_route(points))
+
+    def finish(self, db: Session, trip_id: int):
+        """Write what is left of the trip's route in the caller's transaction"""
+        with self._lock:
+            points = self._pending.pop(trip_id, None)
+
+        if points:
+            db.execute(insert(TripRouteChunk), _chunk_rows(trip_id, points))
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="trip-route-flush", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(TRIP_ROUTE_FLUSH_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            rows = [
+                row
+                for trip_id, points in pending.items()
+                if points
+                for row in _chunk_rows(trip_id, points)
+            ]
+            if not rows:
+                return
+
+            db = SessionLocal()
+            try:
+                db.execute(insert(TripRouteChunk), rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Writing %s trip route chunks failed", len(rows))
+                self._requeue(pending)
+                return
+            finally:
+                db.close()
+
+            counters.inc("trip_route.chunks_written", len(rows))
+
+    def _requeue(self, pending):
+        with self._lock:
+            for trip_id, points in pending.items():
+                # Points recorded since the swap come after the failed ones
+                self._pending[trip_id] = points + self._pending.get(trip_id, [])
+        counters.inc("trip_route.flush_failures")
+
+
+trip_route_recorder = TripRouteRecorder()
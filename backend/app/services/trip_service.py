@@ -2,18 +2,53 @@ from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from datetime import datetime, timezone
 
-from app.models.trips import Trip
-from app.models.fleet import DriverProfile
-from app.models.operations import DriverShift
-from app.models.operations import DriverLocation
+from app.core.config import DISPATCH_CANDIDATES, DISPATCH_MODE
+from app.models.trips import Trip, TripRouteChunk
 from app.models.dispatch import DispatchAttempt
 from app.models.identity import AppUser
 from app.schemas.trip import RiderRequestTrip
-from app.utils.dispatch_attempt import haversine
+from app.services.driver_index_sync import driver_index_sync
+from app.services.batch_dispatch_service import batch_dispatcher
+from app.services.dispatch_expiry_service import dispatch_scheduler
+from app.services.offer_push_service import offer_hub
+from app.services.trip_route_recorder import trip_route_recorder
+from app.services.zone_service import zone_resolver
+from app.utils.route_codec import decode_route, to_epoch_ms, from_epoch_ms
 
 
 class TripService:
 
+    @staticmethod
+    def get_route(db: Session, trip: Trip):
+        """The trip's recorded route, oldest point first, from one query"""
+        chunks = (
+            db.query(TripRouteChunk.points)
+            .filter(TripRouteChunk.trip_id == trip.trip_id)
+            .order_by(TripRouteChunk.started_at, TripRouteChunk.chunk_id)
+            .all()
+        )
+
+        points = [p for (data,) in chunks for p in decode_route(data)]
+        points.extend(trip_route_recorder.pending(trip.trip_id))
+
+        # Fixes from a cache that had not seen the pickup or completion yet
+        start = to_epoch_ms(trip.picked_up_at) if trip.picked_up_at else None
+        end = to_epoch_ms(trip.completed_at) if trip.completed_at else None
+        points = [
+            p for p in points
+            if (start is None or p[2] >= start) and (end is None or p[2] <= end)
+        ]
+        points.sort(key=lambda p: p[2])
+
+        return {
+            "trip_id": trip.trip_id,
+            "point_count": len(points),
+            "points": [
+                {"latitude": lat, "longitude": lng, "recorded_at": from_epoch_ms(ms)}
+                for lat, lng, ms in points
+            ]
+        }
+
     @staticmethod
     def request_trip(
         db: Session,
@@ -47,6 +82,9 @@ class TripService:
         trip = Trip(
             rider_id=user.user_id,
             city_id=data.city_id,
+            zone_id=zone_resolver.zone_for(
+                db, data.city_id, data.pickup_lat, data.pickup_lng
+            ),
             pickup_lat=data.pickup_lat,
             pickup_lng=data.pickup_lng,
             drop_lat=data.drop_lat,
@@ -59,48 +97,35 @@ class TripService:
         db.add(trip)
         db.flush()  # get trip_id
 
-        # 3️⃣ Find available drivers with location
-        drivers = (
-            db.query(DriverProfile, DriverLocation)
-            .join(DriverShift, DriverShift.driver_id == DriverProfile.driver_id)
-            .join(DriverLocation, DriverLocation.driver_id == DriverProfile.driver_id)
-            .filter(
-                DriverProfile.approval_status == "APPROVED",
-                DriverShift.ended_at.is_(None)
-            )
-            .all()
+        # 3️⃣ Find nearest available drivers from the live index
+        selected_drivers = driver_index_sync.nearest_available(
+            db,
+            data.pickup_lat,
+            data.pickup_lng,
+            k=DISPATCH_CANDIDATES,
+            city_id=data.city_id
         )
 
-        if not drivers:
+        if not selected_drivers:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No drivers available"
             )
 
-        # 4️⃣ Calculate distance from pickup
-        driver_distances = []
-        for profile, location in drivers:
-            distance = haversine(
-                data.pickup_lat,
-                data.pickup_lng,
-                location.latitude,
-                location.longitude
-            )
-            driver_distances.append((profile, distance))
+        if DISPATCH_MODE == "BATCHED":
+            # Offers go out with the next matching window for this city
+            db.commit()
+            db.refresh(trip)
+            batch_dispatcher.enqueue(trip)
+            return trip
 
-        # 5️⃣ Sort by nearest
-        driver_distances.sort(key=lambda x: x[1])
-
-        # 6️⃣ Pick first 3 drivers
-        selected_drivers = driver_distances[:3]
-
-        # 7️⃣ Insert dispatch_attempt rows
+        # 4️⃣ Insert dispatch_attempt rows
         now = datetime.now(timezone.utc)
 
-        for profile, _ in selected_drivers:
+        for driver_id, _ in selected_drivers:
             attempt = DispatchAttempt(
                 trip_id=trip.trip_id,
-                driver_id=profile.driver_id,
+                driver_id=driver_id,
                 sent_at=now,
                 response="SENT",
                 created_by=user.user_id
@@ -110,4 +135,7 @@ class TripService:
         db.commit()
         db.refresh(trip)
 
+        dispatch_scheduler.track(trip.trip_id)
+        offer_hub.offer([driver_id for driver_id, _ in selected_drivers], trip)
+
         return trip
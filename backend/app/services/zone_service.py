@@ -0,0 +1,47 @@
+from sqlalchemy.orm import Session
+
+from app.core.config import ZONE_CHECK_SECONDS
+from app.models.core import Zone
+from app.utils.versioned_snapshot import VersionedSnapshot, table_version_sql
+from app.utils.zone_locator import ZoneLocator
+
+
+class ZoneResolver:
+    """
+    Attributes points to zones through an in-memory ZoneLocator. Zone
+    boundaries are parsed and indexed once; at most every
+    ZONE_CHECK_SECONDS a version query decides whether to rebuild.
+    """
+
+    def __init__(self):
+        self._snapshot = VersionedSnapshot(
+            table_version_sql(Zone.__tablename__),
+            self._load,
+            ZONE_CHECK_SECONDS
+        )
+
+    def zone_for(self, db: Session, city_id, latitude, longitude):
+        return self._snapshot.get(db).locate(city_id, latitude, longitude)
+
+    def zones_for(self, db: Session, city_id, latitudes, longitudes):
+        return self._snapshot.get(db).locate_many(city_id, latitudes, longitudes)
+
+    def invalidate(self):
+        self._snapshot.invalidate()
+
+    @staticmethod
+    def _load(db: Session):
+        locator = ZoneLocator()
+        locator.load(
+            db.query(
+                Zone.zone_id,
+                Zone.city_id,
+                Zone.latitude,
+                Zone.longitude,
+                Zone.boundary
+            ).all()
+        )
+        return locator
+
+
+zone_resolver = ZoneResolver()
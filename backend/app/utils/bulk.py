@@ -0,0 +1,38 @@
+import io
+
+from sqlalchemy.orm import Session
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_rows(db: Session, table: str, columns, rows):
+    """
+    Stream ``rows`` into ``table`` with PostgreSQL COPY on the session's
+    connection, so it commits or rolls back with the rest of the unit of work.
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(v) for v in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+            buffer
+        )
+    finally:
+        cursor.close()
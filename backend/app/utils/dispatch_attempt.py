@@ -1,7 +1,12 @@
 import math
 
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+EARTH_RADIUS_KM = 6371
+
 def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # km
+    R = EARTH_RADIUS_KM
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
 
@@ -14,3 +19,68 @@ def haversine(lat1, lon1, lat2, lon2):
 
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
+
+
+def haversine_batch(pickup_lat, pickup_lng, driver_lats, driver_lngs):
+    """
+    Vectorised haversine in km.
+
+    A scalar pickup gives a 1-D array with one distance per driver; arrays of
+    pickups give a (pickups x drivers) matrix.
+    """
+    lat1 = np.radians(np.asarray(pickup_lat, dtype=np.float64))
+    lon1 = np.radians(np.asarray(pickup_lng, dtype=np.float64))
+    lat2 = np.radians(np.asarray(driver_lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(driver_lngs, dtype=np.float64))
+
+    if lat1.ndim:
+        lat1 = lat1[:, None]
+        lon1 = lon1[:, None]
+
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def top_k(distances, k: int):
+    """Indices of the ``k`` smallest distances, nearest first (partial sort)"""
+    distances = np.asarray(distances)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= distances.size:
+        return np.argsort(distances, kind="stable")
+
+    nearest = np.argpartition(distances, k - 1)[:k]
+    return nearest[np.argsort(distances[nearest], kind="stable")]
+
+
+def assign_batch(cost, rounds: int = 1):
+    """
+    Min-cost bipartite matching of rows (trips) to columns (drivers).
+
+    Each round gives every row at most one new column and a column is never
+    used twice, so rows collect up to ``rounds`` distinct columns. ``inf``
+    marks pairs that must not be matched. Returns ``(row, col)`` pairs.
+    """
+    cost = np.array(cost, dtype=np.float64)
+    pairs = []
+
+    for _ in range(rounds):
+        feasible = np.isfinite(cost)
+        if not feasible.any():
+            break
+
+        # Larger than any complete matching of feasible pairs, so the solver
+        # only falls back to an infeasible pair when it has to fill a row
+        blocked = cost[feasible].max() * min(cost.shape) + 1
+        rows, cols = linear_sum_assignment(np.where(feasible, cost, blocked))
+
+        matched = feasible[rows, cols]
+        rows, cols = rows[matched], cols[matched]
+        pairs.extend(zip(rows.tolist(), cols.tolist()))
+        cost[:, cols] = np.inf
+
+    return pairs
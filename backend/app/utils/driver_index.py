@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+
+import numpy as np
+
+from app.core.config import DRIVER_INDEX_CELL_DEGREES
+from app.utils.dispatch_attempt import haversine_batch, top_k
+
+KM_PER_DEGREE = 111.32
+
+
+class DriverGeoIndex:
+    """
+    In-memory grid index of online drivers (approved, on shift, located).
+
+    Drivers are bucketed per (city_id, tenant_id) into square lat/lng cells.
+    A k-nearest query walks rings of cells outwards from the pickup and stops
+    as soon as nothing further out can beat the k-th best distance.
+
+    The index is per process. It is rebuilt from the database on startup
+    and kept in line with the other workers by ``driver_index_sync``;
+    ``seen_at`` (epoch seconds of the driver's last fix or heartbeat) lets
+    it drop drivers that stopped reporting.
+    """
+
+    def __init__(self, cell_degrees: float = DRIVER_INDEX_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        # (city_id, tenant_id) -> {(row, col): {driver_id: (lat, lng)}}
+        self._partitions = {}
+        # driver_id -> ((city_id, tenant_id), (row, col))
+        self._drivers = {}
+        # driver_id -> epoch seconds of the last fix or heartbeat
+        self._seen = {}
+
+    def _cell(self, lat: float, lng: float):
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lng / self.cell_degrees)
+        )
+
+    def upsert(self, driver_id: int, city_id, tenant_id, latitude, longitude, seen_at=None):
+        lat, lng = float(latitude), float(longitude)
+        key = (city_id, tenant_id)
+        cell = self._cell(lat, lng)
+        seen_at = time.time() if seen_at is None else seen_at
+
+        with self._lock:
+            # A refresh must not move a driver back to an older position
+            if self._seen.get(driver_id, seen_at) > seen_at:
+                return
+            if self._drivers.get(driver_id) != (key, cell):
+                self._discard(driver_id)
+                self._drivers[driver_id] = (key, cell)
+            self._seen[driver_id] = seen_at
+            cells = self._partitions.setdefault(key, {})
+            cells.setdefault(cell, {})[driver_id] = (lat, lng)
+
+    def remove(self, driver_id: int):
+        with self._lock:
+            self._discard(driver_id)
+
+    def evict_older_than(self, cutoff: float) -> int:
+        """Drop drivers not seen since ``cutoff`` (epoch seconds); returns how many"""
+        with self._lock:
+            stale = [d for d, seen_at in self._seen.items() if seen_at < cutoff]
+            for driver_id in stale:
+                self._discard(driver_id)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._drivers.clear()
+            self._seen.clear()
+
+    def __contains__(self, driver_id: int) -> bool:
+        return driver_id in self._drivers
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def positions(self, driver_ids):
+        """Return ``{driver_id: (lat, lng, tenant_id)}`` for drivers still indexed"""
+        result = {}
+        with self._lock:
+            for driver_id in driver_ids:
+                entry = self._drivers.get(driver_id)
+                if not entry:
+                    continue
+                key, cell = entry
+                lat, lng = self._partitions[key][cell][driver_id]
+                result[driver_id] = (lat, lng, key[1])
+        return result
+
+    def snapshot(self):
+        """Every indexed driver as ``(driver_id, city_id, tenant_id, lat, lng)``"""
+        with self._lock:
+            return [
+                (driver_id, city_id, tenant_id, lat, lng)
+                for (city_id, tenant_id), cells in self._partitions.items()
+                for bucket in cells.values()
+                for driver_id, (lat, lng) in bucket.items()
+            ]
+
+    def _discard(self, driver_id: int):
+        self._seen.pop(driver_id, None)
+        entry = self._drivers.pop(driver_id, None)
+        if not entry:
+            return
+
+        key, cell = entry
+        cells = self._partitions[key]
+        bucket = cells[cell]
+        del bucket[driver_id]
+
+        if not bucket:
+            del cells[cell]
+            if not cells:
+                del self._partitions[key]
+
+    def nearest(
+        self,
+        latitude,
+        longitude,
+        k: int,
+        city_id=None,
+        tenant_id=None,
+        exclude=()
+    ):
+        """
+        Return up to ``k`` ``(driver_id, distance_km)`` pairs, nearest first.
+
+        ``city_id`` / ``tenant_id`` of ``None`` match every partition.
+        """
+        lat, lng = float(latitude), float(longitude)
+        origin_row, origin_col = self._cell(lat, lng)
+
+        # Lower bound on the distance to anything outside the rings scanned
+        # so far; longitude cells shrink towards the poles.
+        cell_km = (
+            self.cell_degrees
+            * KM_PER_DEGREE
+            * max(math.cos(math.radians(min(abs(lat) + 1, 89))), 0.01)
+        )
+
+        with self._lock:
+            partitions = [
+                cells
+                for (p_city, p_tenant), cells in self._partitions.items()
+                if (city_id is None or p_city == city_id)
+                and (tenant_id is None or p_tenant == tenant_id)
+            ]
+            if not partitions or k <= 0:
+                return []
+
+            occupied = sum(len(cells) for cells in partitions)
+            candidates = []     # (driver_id, lat, lng) not ranked yet
+            best_ids = np.empty(0, dtype=np.int64)
+            best_km = np.empty(0, dtype=np.float64)
+
+            def collect(bucket):
+                for driver_id, (d_lat, d_lng) in bucket.items():
+                    if driver_id not in exclude:
+                        candidates.append((driver_id, d_lat, d_lng))
+
+            def rank():
+                nonlocal best_ids, best_km
+                if not candidates:
+                    return
+                ids, lats, lngs = zip(*candidates)
+                candidates.clear()
+
+                km = np.concatenate(
+                    (best_km, haversine_batch(lat, lng, lats, lngs))
+                )
+                ids = np.concatenate((best_ids, np.array(ids, dtype=np.int64)))
+                keep = top_k(km, k)
+                best_ids, best_km = ids[keep], km[keep]
+
+            ring = 0
+            while True:
+                # Sparse index: walking empty rings costs more than
+                # looking at every occupied cell left
+                if (2 * ring + 1) ** 2 > 4 * occupied:
+                    for cells in partitions:
+                        for (row, col), bucket in cells.items():
+                            if max(abs(row - origin_row), abs(col - origin_col)) >= ring:
+                                collect(bucket)
+                    rank()
+                    break
+
+                for cell in _ring_cells(origin_row, origin_col, ring):
+                    for cells in partitions:
+                        bucket = cells.get(cell)
+                        if bucket:
+                            collect(bucket)
+
+                rank()
+                if best_km.size >= k and best_km[-1] <= ring * cell_km:
+                    break
+
+                ring += 1
+
+        return list(zip(best_ids.tolist(), best_km.tolist()))
+
+
+def _ring_cells(row: int, col: int, ring: int):
+    if ring == 0:
+        yield (row, col)
+        return
+
+    for c in range(col - ring, col + ring + 1):
+        yield (row - ring, c)
+        yield (row + ring, c)
+    for r in range(row - ring + 1, row + ring):
+        yield (r, col - ring)
+        yield (r, col + ring)
+
+
+driver_index = DriverGeoIndex()
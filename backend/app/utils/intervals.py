@@ -0,0 +1,34 @@
+from bisect import bisect_right
+
+
+class IntervalLookup:
+    """
+    Answers "which values apply at t" for a fixed set of half-open
+    ``[start, end)`` intervals (``end`` None = open-ended) with one binary
+    search.
+
+    The interval endpoints split the axis into elementary segments and the
+    values active on each segment are computed once up front, so overlapping
+    intervals cost nothing at lookup time.
+    """
+
+    def __init__(self, intervals):
+        intervals = list(intervals)
+        self._bounds = sorted(
+            {start for start, _, _ in intervals}
+            | {end for _, end, _ in intervals if end is not None}
+        )
+        self._active = [
+            tuple(
+                value for start, end, value in intervals
+                if start <= bound and (end is None or bound < end)
+            )
+            for bound in self._bounds
+        ]
+
+    def at(self, t):
+        i = bisect_right(self._bounds, t) - 1
+        return self._active[i] if i >= 0 else ()
+
+    def __len__(self) -> int:
+        return len(self._bounds)
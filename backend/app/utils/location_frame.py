@@ -0,0 +1,64 @@
+"""
+Fixed-layout binary location frames for POST /drivers/location/binary.
+
+A body is one or more 28-byte little-endian frames back to back:
+
+    offset  type    field
+    0       uint64  driver_id
+    8       int64   recorded_at, epoch milliseconds UTC
+    16      int32   latitude  x 1e7
+    20      int32   longitude x 1e7
+    24      uint16  heading, centidegrees (0-35999)
+    26      uint16  speed, cm/s
+
+The whole body is decoded with one ``numpy.frombuffer`` call and validated
+column-wise.
+"""
+import numpy as np
+
+COORD_SCALE = 10_000_000
+MAX_EPOCH_MS = 253_402_300_800_000   # year 10000, the limit of datetime
+
+FRAME_DTYPE = np.dtype([
+    ("driver_id", "<u8"),
+    ("recorded_at_ms", "<i8"),
+    ("lat_e7", "<i4"),
+    ("lng_e7", "<i4"),
+    ("heading_cdeg", "<u2"),
+    ("speed_cms", "<u2"),
+])
+
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+
+def decode_frames(body: bytes) -> np.ndarray:
+    """Decode and validate ``body``; raises ValueError on a malformed body"""
+    if not body or len(body) % FRAME_SIZE:
+        raise ValueError(f"Body must be a multiple of {FRAME_SIZE} bytes")
+
+    frames = np.frombuffer(body, dtype=FRAME_DTYPE)
+
+    if np.any(np.abs(frames["lat_e7"]) > 90 * COORD_SCALE):
+        raise ValueError("Invalid latitude")
+    if np.any(np.abs(frames["lng_e7"]) > 180 * COORD_SCALE):
+        raise ValueError("Invalid longitude")
+    if np.any(frames["heading_cdeg"] >= 36000):
+        raise ValueError("Invalid heading")
+    timestamps = frames["recorded_at_ms"]
+    if np.any((timestamps <= 0) | (timestamps >= MAX_EPOCH_MS)):
+        raise ValueError("Invalid timestamp")
+
+    return frames
+
+
+def encode_frames(driver_id, recorded_at_ms, latitudes, longitudes, headings=0, speeds=0) -> bytes:
+    """Build a body from columns; the reference encoder for clients"""
+    count = len(latitudes)
+    frames = np.zeros(count, dtype=FRAME_DTYPE)
+    frames["driver_id"] = driver_id
+    frames["recorded_at_ms"] = recorded_at_ms
+    frames["lat_e7"] = np.round(np.asarray(latitudes, dtype=np.float64) * COORD_SCALE)
+    frames["lng_e7"] = np.round(np.asarray(longitudes, dtype=np.float64) * COORD_SCALE)
+    frames["heading_cdeg"] = np.round(np.asarray(headings, dtype=np.float64) * 100)
+    frames["speed_cms"] = np.round(np.asarray(speeds, dtype=np.float64) * 100)
+    return frames.tobytes()
@@ -0,0 +1,21 @@
+import threading
+from collections import defaultdict
+
+
+class Counters:
+    """Process-local counters, read through GET /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(int)
+
+    def inc(self, name: str, amount: int = 1):
+        with self._lock:
+            self._values[name] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+
+counters = Counters()
@@ -0,0 +1,58 @@
+import math
+import threading
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel.
+
+    Scheduling and cancelling are O(1); each tick only visits one slot.
+    Timers further out than one revolution carry a round counter.
+    Keys are unique: scheduling a key again replaces its previous timer.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512):
+        self.tick_seconds = tick_seconds
+        self._slots = [{} for _ in range(slots)]
+        self._cursor = 0
+        self._where = {}    # key -> slot index
+        self._lock = threading.Lock()
+
+    def schedule(self, key, delay_seconds: float, payload=None):
+        ticks = max(1, math.ceil(delay_seconds / self.tick_seconds))
+        size = len(self._slots)
+
+        with self._lock:
+            self._cancel(key)
+            slot = (self._cursor + ticks) % size
+            self._slots[slot][key] = [(ticks - 1) // size, payload]
+            self._where[key] = slot
+
+    def cancel(self, key):
+        with self._lock:
+            self._cancel(key)
+
+    def _cancel(self, key):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def advance(self):
+        """Move one tick forward and return ``(key, payload)`` of due timers"""
+        with self._lock:
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            slot = self._slots[self._cursor]
+
+            due = []
+            for key, entry in list(slot.items()):
+                if entry[0] == 0:
+                    due.append((key, entry[1]))
+                    del slot[key]
+                    del self._where[key]
+                else:
+                    entry[0] -= 1
+
+        return due
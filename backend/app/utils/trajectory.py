@@ -0,0 +1,80 @@
+import numpy as np
+
+from app.utils.dispatch_attempt import EARTH_RADIUS_KM
+
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+
+
+def to_local_meters(lats, lngs):
+    """
+    Equirectangular projection around the track's mean latitude. Accurate to
+    well under a metre over the few kilometres a single track covers.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    lat0 = np.radians(lats.mean())
+
+    x = np.radians(lngs - lngs[0]) * EARTH_RADIUS_M * np.cos(lat0)
+    y = np.radians(lats - lats[0]) * EARTH_RADIUS_M
+    return x, y
+
+
+def douglas_peucker(xs, ys, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification. Returns a boolean mask of the points to
+    keep; the first and last point are always kept.
+
+    Distances are measured to the segment rather than the infinite line so
+    that U-turns and back-and-forth movement are not flattened away.
+    """
+    n = len(xs)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        dx = xs[end] - xs[start]
+        dy = ys[end] - ys[start]
+        px = xs[start + 1:end] - xs[start]
+        py = ys[start + 1:end] - ys[start]
+
+        seg2 = dx * dx + dy * dy
+        t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0) if seg2 else 0.0
+        dist = np.hypot(px - t * dx, py - t * dy)
+
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return keep
+
+
+def simplify_track(lats, lngs, timestamps, tolerance_m: float, max_gap_seconds: float):
+    """
+    Simplify one driver's time-ordered fixes. The track is split wherever two
+    fixes are more than ``max_gap_seconds`` apart so a simplified line never
+    bridges a gap in the data. Returns the keep mask.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    keep = np.zeros(len(timestamps), dtype=bool)
+    if not len(timestamps):
+        return keep
+
+    xs, ys = to_local_meters(lats, lngs)
+    breaks = np.flatnonzero(np.diff(timestamps) > max_gap_seconds) + 1
+    bounds = np.concatenate(([0], breaks, [len(timestamps)]))
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        keep[start:end] = douglas_peucker(xs[start:end], ys[start:end], tolerance_m)
+
+    return keep
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries also expire after
+    ``ttl_seconds``. ``get`` returns ``MISSING`` on a miss so that ``None``
+    can be cached.
+
+    A value read from the database can race an invalidation: take
+    ``generation(key)`` before the read and store the value with
+    ``set_if_current`` so it is dropped if the key was invalidated meanwhile.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._generations = {}          # key -> times invalidated
+        self._epoch = 0                 # bumped when generations are reset
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= now:
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl_seconds: float = None):
+        with self._lock:
+            self._store(key, value, ttl_seconds)
+
+    def generation(self, key):
+        """Token for ``set_if_current``; take it before reading the value"""
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set_if_current(self, key, value, generation, ttl_seconds: float = None) -> bool:
+        """``set`` unless ``key`` was invalidated since ``generation`` was taken"""
+        with self._lock:
+            if generation != (self._epoch, self._generations.get(key, 0)):
+                return False
+            self._store(key, value, ttl_seconds)
+            return True
+
+    def _store(self, key, value, ttl_seconds):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _bump(self, key):
+        self._generations[key] = self._generations.get(key, 0) + 1
+        # Resetting every generation also voids tokens taken before it
+        if len(self._generations) > self.max_entries:
+            self._reset_generations()
+
+    def _reset_generations(self):
+        self._generations.clear()
+        self._epoch += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._bump(key)
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose value matches ``predicate``"""
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if predicate(v)]:
+                del self._entries[key]
+            self._reset_generations()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._reset_generations()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from sqlalchemy import text
+
+
+def table_version_sql(*tables):
+    """
+    A query whose result changes whenever a row of ``tables`` is inserted,
+    updated or deleted, including by hand: the tables' table_version
+    counters, bumped by statement triggers (see RideSharing.sql). One index
+    lookup per table, however large the table is.
+    """
+    parts = ", ".join(
+        f"(SELECT coalesce(max(version), 0) FROM table_version WHERE table_name = '{table}')"
+        for table in tables
+    )
+    return text(f"SELECT {parts}")
+
+
+class VersionedSnapshot:
+    """
+    Holds what ``load(db)`` returns and rebuilds it only when the result of
+    ``version_sql`` changes, which is checked at most every
+    ``check_seconds``. While another thread runs a check, readers get the
+    current value instead of waiting; only the first load (and the one
+    after ``invalidate``) is waited for. ``generation`` increases on every
+    reload, so callers can key derived caches on it.
+    """
+
+    def __init__(self, version_sql, load, check_seconds: float):
+        self._version_sql = version_sql
+        self._load = load
+        self.check_seconds = check_seconds
+        self._value = None
+        self._version = None
+        self._checked_at = None
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db):
+        checked_at = self._checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.check_seconds:
+            return self._value
+
+        # Nothing to serve yet: wait for whoever is loading
+        if not self._lock.acquire(blocking=checked_at is None):
+            return self._value
+
+        try:
+            # Another request may have refreshed while we waited
+            if self._checked_at is checked_at:
+                version = tuple(db.execute(self._version_sql).one())
+                if version != self._version:
+                    self._value = self._load(db)
+                    self._version = version
+                    self.generation += 1
+                self._checked_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+        return self._value
+
+    def invalidate(self):
+        """Force a version check and reload on next use"""
+        with self._lock:
+            self._version = None
+            self._checked_at = None
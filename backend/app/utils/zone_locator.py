@@ -0,0 +1,194 @@
+import json
+import math
+import re
+import threading
+
+import numpy as np
+
+from app.core.config import ZONE_MATCH_MAX_KM, ZONE_GRID_CELL_DEGREES
+from app.utils.dispatch_attempt import haversine_batch
+
+_WKT_PREFIX = re.compile(r"^\s*(?:SRID=\d+;)?\s*(MULTIPOLYGON|POLYGON)\s*", re.IGNORECASE)
+_WKT_PAIR = re.compile(r"(-?[\d.]+(?:[eE][-+]?\d+)?)\s+(-?[\d.]+(?:[eE][-+]?\d+)?)")
+
+
+def parse_boundary(boundary):
+    """
+    Parse a zone boundary stored as WKT (POLYGON / MULTIPOLYGON, optionally
+    with an SRID= prefix) or GeoJSON (Polygon, MultiPolygon or a Feature of
+    either). Coordinates are (longitude, latitude) as in both standards.
+
+    Returns a list of polygons, each a list of rings (outer ring first, then
+    holes), each ring a list of (lng, lat); None if there is no usable shape.
+    """
+    if not boundary or not boundary.strip():
+        return None
+
+    try:
+        match = _WKT_PREFIX.match(boundary)
+        if match:
+            kind = match.group(1).upper()
+            body = _WKT_PAIR.sub(r"[\1,\2]", boundary[match.end():])
+            coordinates = json.loads(body.replace("(", "[").replace(")", "]"))
+        else:
+            geometry = json.loads(boundary)
+            if geometry.get("type") == "Feature":
+                geometry = geometry["geometry"]
+            kind = geometry["type"].upper()
+            coordinates = geometry["coordinates"]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    if kind == "POLYGON":
+        coordinates = [coordinates]
+    elif kind != "MULTIPOLYGON":
+        return None
+
+    polygons = [
+        [[(float(x), float(y)) for x, y, *_ in ring] for ring in polygon]
+        for polygon in coordinates
+        if polygon and len(polygon[0]) >= 3
+    ]
+    return polygons or None
+
+
+def _in_ring(x: float, y: float, ring) -> bool:
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def _in_polygons(x: float, y: float, polygons) -> bool:
+    for rings in polygons:
+        if _in_ring(x, y, rings[0]) and not any(_in_ring(x, y, hole) for hole in rings[1:]):
+            return True
+    return False
+
+
+class ZoneLocator:
+    """
+    Maps a point to its zone.
+
+    Zones with a parseable boundary are matched by point-in-polygon. Their
+    bounding boxes are bucketed into ZONE_GRID_CELL_DEGREES grid cells per
+    city, so a lookup only tests the few polygons registered in the point's
+    cell. Zones without a boundary fall back to the nearest center within
+    ZONE_MATCH_MAX_KM. Where zones overlap, the lowest zone_id wins.
+    """
+
+    def __init__(self, cell_degrees: float = ZONE_GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        # city_id -> {(row, col): [(zone_id, bbox, polygons)]}
+        self._grids = {}
+        # city_id -> (zone_ids, center_lats, center_lngs) of boundary-less zones
+        self._centers = {}
+
+    def _cell(self, lat: float, lng: float):
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lng / self.cell_degrees)
+        )
+
+    def load(self, zones):
+        """
+        Replace the zone set with ``(zone_id, city_id, center_lat,
+        center_lng, boundary)`` rows
+        """
+        grids = {}
+        centers = {}
+
+        for zone_id, city_id, lat, lng, boundary in sorted(zones, key=lambda z: z[0]):
+            polygons = parse_boundary(boundary)
+
+            if polygons:
+                xs = [x for rings in polygons for x, _ in rings[0]]
+                ys = [y for rings in polygons for _, y in rings[0]]
+                bbox = (min(xs), min(ys), max(xs), max(ys))
+                entry = (zone_id, bbox, polygons)
+
+                grid = grids.setdefault(city_id, {})
+                row0, col0 = self._cell(bbox[1], bbox[0])
+                row1, col1 = self._cell(bbox[3], bbox[2])
+                for row in range(row0, row1 + 1):
+                    for col in range(col0, col1 + 1):
+                        grid.setdefault((row, col), []).append(entry)
+
+            elif lat is not None and lng is not None:
+                centers.setdefault(city_id, []).append((zone_id, float(lat), float(lng)))
+
+        center_arrays = {
+            city_id: (
+                np.array([z[0] for z in rows], dtype=np.int64),
+                np.array([z[1] for z in rows], dtype=np.float64),
+                np.array([z[2] for z in rows], dtype=np.float64)
+            )
+            for city_id, rows in centers.items()
+        }
+
+        with self._lock:
+            self._grids = grids
+            self._centers = center_arrays
+
+    def locate(self, city_id, latitude, longitude):
+        return self.locate_many(city_id, [latitude], [longitude])[0]
+
+    def locate_many(self, city_id, latitudes, longitudes):
+        """Zone id (or None) for each point of one city"""
+        grid = self._grids.get(city_id)
+        result = []
+        missing = []
+
+        for i, (lat, lng) in enumerate(zip(latitudes, longitudes)):
+            lat, lng = float(lat), float(lng)
+            zone_id = None
+
+            if grid:
+                for candidate, bbox, polygons in grid.get(self._cell(lat, lng), ()):
+                    if (
+                        bbox[0] <= lng <= bbox[2]
+                        and bbox[1] <= lat <= bbox[3]
+                        and _in_polygons(lng, lat, polygons)
+                    ):
+                        zone_id = candidate
+                        break
+
+            if zone_id is None:
+                missing.append(i)
+            result.append(zone_id)
+
+        if missing:
+            nearest = self._nearest_centers(
+                city_id,
+                [latitudes[i] for i in missing],
+                [longitudes[i] for i in missing]
+            )
+            for i, zone_id in zip(missing, nearest):
+                result[i] = zone_id
+
+        return result
+
+    def _nearest_centers(self, city_id, latitudes, longitudes):
+        zones = self._centers.get(city_id)
+        if zones is None:
+            return [None] * len(latitudes)
+
+        zone_ids, center_lats, center_lngs = zones
+        # (points x zones) distances, one row per point
+        distances = haversine_batch(
+            np.asarray(latitudes, dtype=np.float64),
+            np.asarray(longitudes, dtype=np.float64),
+            center_lats,
+            center_lngs
+        )
+        nearest = distances.argmin(axis=1)
+        within = distances[np.arange(len(nearest)), nearest] <= ZONE_MATCH_MAX_KM
+
+        return [
+            int(zone_ids[i]) if ok else None
+            for i, ok in zip(nearest.tolist(), within.tolist())
+        ]